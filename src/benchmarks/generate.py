@@ -0,0 +1,120 @@
+# generate.py
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+CHANNELS = [
+    "Google", "Facebook", "TikTok", "Bing", "LinkedIn",
+    "Twitter", "Snapchat", "Pinterest", "Reddit", "YouTube",
+]
+EVENTS = ["view", "click", "signup", "purchase"]
+
+
+def _keys(rng, rows, day, clients, channels, days):
+    """client, date and channel columns drawn from the given cardinalities.
+
+    Combinations are distinct within a file while there are enough of
+    them, as in a real export.
+    """
+    client_names = np.array([f"Client{i:04d}" for i in range(clients)])
+    channel_names = np.array([
+        CHANNELS[i] if i < len(CHANNELS) else f"Channel{i:03d}"
+        for i in range(channels)
+    ])
+    combinations = clients * channels * days
+    keys = rng.choice(combinations, rows, replace=rows > combinations)
+    keys, offsets = np.divmod(keys, days)
+    clients_idx, channels_idx = np.divmod(keys, channels)
+    dates = pd.to_datetime(day) - pd.to_timedelta(offsets, unit="D")
+    return (
+        client_names[clients_idx],
+        dates,
+        channel_names[channels_idx],
+    )
+
+
+def write_ads(path, rng, rows, day, clients, channels, days, campaigns):
+    client, dates, channel = _keys(rng, rows, day, clients, channels, days)
+    df = pd.DataFrame({
+        "Client": client,
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Channel": channel,
+        "Campaign_id": [
+            f"camp_{i:05d}" for i in rng.integers(0, campaigns, rows)
+        ],
+        "Spend_usd": rng.uniform(1, 1000, rows).round(2),
+    })
+    df.to_csv(path, index=False)
+
+
+def write_performance(path, rng, rows, day, clients, channels, days):
+    client, dates, channel = _keys(rng, rows, day, clients, channels, days)
+    impressions = rng.integers(100, 100_000, rows)
+    clicks = rng.integers(0, 100, rows) * impressions // 1000
+    df = pd.DataFrame({
+        "client": client,
+        "date": dates.strftime("%Y-%m-%d"),
+        "channel": channel,
+        "impressions": impressions,
+        "clicks": clicks,
+        "conversions": clicks // rng.integers(5, 50, rows),
+        "cost_per_click": rng.uniform(0.1, 5, rows).round(2),
+    })
+    df.to_json(path, orient="records")
+
+
+def write_clickstreams(path, rng, rows, day, clients, channels, days):
+    client, dates, channel = _keys(rng, rows, day, clients, channels, days)
+    lines = (
+        "client: " + pd.Series(client)
+        + " | date: " + pd.Series(dates.strftime("%m/%d/%Y"))
+        + " | channel: " + pd.Series(channel)
+        + " | event: " + pd.Series(np.array(EVENTS)[
+            rng.integers(0, len(EVENTS), rows)
+        ])
+    )
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def generate(
+    directory,
+    files=3,
+    rows=10_000,
+    clients=50,
+    channels=8,
+    campaigns=200,
+    days=30,
+    seed=0,
+):
+    """write `files` AD_SPEND, PERFORMANCE and CLICKSTREAMS files each.
+
+    Every file holds `rows` rows whose client, channel and campaign keys
+    are drawn from the given cardinalities and whose dates fall in the
+    `days` before the date in the file name. Returns the written paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    start = date(2025, 1, 1)
+    paths = []
+
+    for index in range(files):
+        day = start + timedelta(days=index)
+        stamp = day.strftime("%Y%m%d")
+        keys = (rows, day, clients, channels, days)
+
+        path = os.path.join(directory, f"AD_SPEND_BENCH_{stamp}.csv")
+        write_ads(path, rng, *keys, campaigns)
+        paths.append(path)
+
+        path = os.path.join(directory, f"PERFORMANCE_BENCH_{stamp}.json")
+        write_performance(path, rng, *keys)
+        paths.append(path)
+
+        path = os.path.join(directory, f"CLICKSTREAMS_BENCH_{stamp}.txt")
+        write_clickstreams(path, rng, *keys)
+        paths.append(path)
+
+    return paths
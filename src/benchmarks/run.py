@@ -0,0 +1,229 @@
+# run.py
+"""Benchmark the loaders, the merge and the database writer.
+
+    python -m src.benchmarks.run --rows 100000 --output bench.json
+    python -m src.benchmarks.run --compare bench.json
+
+Data comes from generate.py. Writes go to a SQLite file unless
+--database-url points at Postgres.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import sqlalchemy as sa
+from .generate import generate
+from ..database.database_writer import DatabaseWriter
+from ..etl.pipeline import TABLE_NAMES, loader_class, merge_frames
+
+BENCHMARK_TABLES = tuple(TABLE_NAMES.values())
+TABLE_PREFIX = "bench_"  # never touch the pipeline's own tables
+
+
+def time_call(function, repeat, setup=None):
+    """seconds taken by each of `repeat` calls, and the last return value"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def summarize(timings, rows, size=None):
+    best = min(timings)
+    summary = {
+        "seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "repeat": len(timings),
+        "rows": rows,
+        "rows_per_second": rows / best if best else None,
+    }
+    if size is not None:
+        summary["bytes"] = size
+        summary["mb_per_second"] = size / 2**20 / best if best else None
+    return summary
+
+
+def load_all(paths):
+    frames = {table: [] for table in BENCHMARK_TABLES}
+    for fullpath in paths:
+        loader_cls = loader_class(os.path.basename(fullpath))
+        frames[TABLE_NAMES[loader_cls]].append(loader_cls(fullpath).load())
+    return frames
+
+
+def drop_tables(engine):
+    with engine.begin() as conn:
+        for table_name in BENCHMARK_TABLES:
+            conn.execute(sa.text(
+                f"DROP TABLE IF EXISTS {TABLE_PREFIX}{table_name}"
+            ))
+
+
+def checked_write(writer, df, table_name):
+    """write df, raising if it failed, so no rolled back write is timed"""
+    if not writer.load_to_database(df, table_name):
+        raise RuntimeError(f"Benchmark write to {table_name} failed")
+
+
+def run(paths, engine, repeat=3):
+    """time each stage over paths, returns {benchmark: summary}"""
+    results = {}
+
+    for loader_cls, table_name in TABLE_NAMES.items():
+        files = [
+            fullpath for fullpath in paths
+            if loader_class(os.path.basename(fullpath)) is loader_cls
+        ]
+        timings, frames = time_call(
+            lambda: [loader_cls(fullpath).load() for fullpath in files],
+            repeat,
+        )
+        results[f"load_{table_name}"] = summarize(
+            timings,
+            sum(len(df) for df in frames),
+            sum(os.path.getsize(fullpath) for fullpath in files),
+        )
+
+    frames = load_all(paths)
+    timings, merged = time_call(
+        lambda: merge_frames(
+            frames["ads_data"],
+            frames["performance_data"],
+            frames["clickstreams_data"],
+        ),
+        repeat,
+    )
+    results["merge"] = summarize(timings, len(merged))
+
+    natural_keys = {
+        f"{TABLE_PREFIX}{table_name}": loader_cls.natural_key
+        for loader_cls, table_name in TABLE_NAMES.items()
+    }
+    for mode in ("append", "upsert"):
+        writer = DatabaseWriter(
+            engine, mode=mode, natural_keys=natural_keys, dedupe=False
+        )
+        for table_name, table_frames in frames.items():
+            df = pd.concat(table_frames, ignore_index=True)
+            if mode == "upsert":
+                df = df.drop_duplicates(
+                    subset=list(natural_keys[f"{TABLE_PREFIX}{table_name}"])
+                )
+            timings, _ = time_call(
+                lambda: checked_write(
+                    writer, df, f"{TABLE_PREFIX}{table_name}"
+                ),
+                repeat,
+                setup=lambda: drop_tables(engine),
+            )
+            results[f"write_{mode}_{table_name}"] = summarize(
+                timings, len(df)
+            )
+    drop_tables(engine)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    """print each benchmark's change in seconds against a baseline run"""
+    print(f"{'benchmark':<40} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        print(
+            f"{name:<40} {before['seconds']:>10.4f}"
+            f" {result['seconds']:>10.4f} {change:>+8.1%}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=3,
+                        help="files per source")
+    parser.add_argument("--rows", type=int, default=10_000,
+                        help="rows per file")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--campaigns", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30,
+                        help="distinct dates per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-directory",
+                        help="keep generated files here instead of a tempdir")
+    parser.add_argument("--database-url",
+                        help="SQLAlchemy URL, a SQLite file by default")
+    parser.add_argument("--output", help="write results as JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to compare")
+    args = parser.parse_args(argv)
+
+    params = {
+        "files": args.files,
+        "rows": args.rows,
+        "clients": args.clients,
+        "channels": args.channels,
+        "campaigns": args.campaigns,
+        "days": args.days,
+        "seed": args.seed,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_directory = args.data_directory or tmp
+        paths = generate(data_directory, **params)
+        url = args.database_url or (
+            f"sqlite:///{os.path.join(tmp, 'benchmark.db')}"
+        )
+        engine = sa.create_engine(url)
+        try:
+            results = run(paths, engine, repeat=args.repeat)
+        finally:
+            engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "database": engine.dialect.name,
+        "params": params,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    else:
+        print(json.dumps(results, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from .database_writer import ddl_lock
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300  # a claim not renewed for this long is given up
+INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+metadata = sa.MetaData()
+
+claims_table = sa.Table(
+    "ingestion_claims",
+    metadata,
+    sa.Column("source_path", sa.Text, primary_key=True),
+    sa.Column("file_size", sa.BigInteger, nullable=False),
+    sa.Column("mtime_ns", sa.BigInteger, nullable=False),
+    # pending, claimed, done or failed
+    sa.Column("status", sa.Text, nullable=False),
+    sa.Column("worker", sa.Text),
+    sa.Column("attempts", sa.Integer, nullable=False, default=0),
+    sa.Column("lease_expires", sa.DateTime(timezone=True)),
+    sa.Column("finished_at", sa.DateTime(timezone=True)),
+)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class FileClaims:
+    """Shares raw files out between ingest processes through one table.
+
+    Every process registers the files it found, then claims them one at
+    a time as its parsers have room. A claim is a row lock taken with
+    SELECT ... FOR UPDATE SKIP LOCKED, so two processes never get the
+    same file and never wait on each other. Claims hold a lease that a
+    heartbeat thread renews; when a process dies its leases run out and
+    the files go to whoever claims next.
+    """
+
+    def __init__(self, engine, worker=None, lease_seconds=LEASE_SECONDS):
+        self.engine = engine
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = timedelta(seconds=lease_seconds)
+        with engine.begin() as conn:
+            ddl_lock(conn, claims_table.name)
+            metadata.create_all(conn, tables=[claims_table])
+
+    def register(self, entries):
+        """offer (fullpath, size) entries for claiming.
+
+        A file already done is offered again only once its size or
+        mtime changed. Failed files are offered again.
+        """
+        rows = [
+            {
+                "path": fullpath,
+                "size": size,
+                "mtime_ns": os.stat(fullpath).st_mtime_ns,
+            }
+            for fullpath, size in entries
+        ]
+        if not rows:
+            return
+
+        c = claims_table.c
+        insert = INSERTS[self.engine.dialect.name](claims_table)
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert.values(
+                    source_path=sa.bindparam("path"),
+                    file_size=sa.bindparam("size"),
+                    mtime_ns=sa.bindparam("mtime_ns"),
+                    status="pending",
+                    attempts=0,
+                ).on_conflict_do_nothing(),
+                rows,
+            )
+            size = sa.bindparam("size")
+            mtime_ns = sa.bindparam("mtime_ns")
+            changed = (c.file_size != size) | (c.mtime_ns != mtime_ns)
+            conn.execute(
+                claims_table.update()
+                .where(c.source_path == sa.bindparam("path"))
+                .where((c.status == "failed") | (c.status == "done") & changed)
+                .values(
+                    status="pending",
+                    worker=None,
+                    file_size=size,
+                    mtime_ns=mtime_ns,
+                ),
+                rows,
+            )
+
+    def claim(self):
+        """claim the largest open file, None once there is none.
+
+        Files whose claim's lease ran out count as open.
+        """
+        c = claims_table.c
+        while True:
+            now = _now()
+            claimable = (c.status == "pending") | (
+                (c.status == "claimed") & (c.lease_expires < now)
+            )
+            with self.engine.begin() as conn:
+                row = conn.execute(
+                    sa.select(c.source_path, c.worker, c.status)
+                    .where(claimable)
+                    .order_by(c.file_size.desc())
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).first()
+                if row is None:
+                    return None
+                claimed = conn.execute(
+                    claims_table.update()
+                    .where(c.source_path == row.source_path)
+                    .where(claimable)
+                    .values(
+                        status="claimed",
+                        worker=self.worker,
+                        attempts=c.attempts + 1,
+                        lease_expires=now + self.lease,
+                    )
+                ).rowcount
+            if claimed:
+                if row.status == "claimed":
+                    logger.warning(
+                        f"Took over {os.path.basename(row.source_path)}"
+                        f" from {row.worker}, whose lease ran out"
+                    )
+                return row.source_path
+
+    def claimed(self):
+        """claim files one by one as the caller asks for the next"""
+        while True:
+            fullpath = self.claim()
+            if fullpath is None:
+                return
+            yield fullpath
+
+    def finish(self, fullpath, ok=True):
+        """mark this worker's claim on fullpath done, or failed"""
+        c = claims_table.c
+        with self.engine.begin() as conn:
+            conn.execute(
+                claims_table.update()
+                .where(c.source_path == fullpath)
+                .where(c.worker == self.worker)
+                .where(c.status == "claimed")
+                .values(status="done" if ok else "failed", finished_at=_now())
+            )
+
+    def release(self):
+        """fail the claims this worker still holds, so they are retried"""
+        c = claims_table.c
+        with self.engine.begin() as conn:
+            released = conn.execute(
+                claims_table.update()
+                .where(c.worker == self.worker)
+                .where(c.status == "claimed")
+                .values(status="failed", finished_at=_now())
+            ).rowcount
+        if released:
+            logger.warning(f"Released {released} unfinished file claims")
+
+    def renew(self):
+        """extend the leases of every claim this worker holds"""
+        c = claims_table.c
+        with self.engine.begin() as conn:
+            conn.execute(
+                claims_table.update()
+                .where(c.worker == self.worker)
+                .where(c.status == "claimed")
+                .values(lease_expires=_now() + self.lease)
+            )
+
+    @contextmanager
+    def heartbeat(self):
+        """renew this worker's leases in the background while in the body"""
+        stop = threading.Event()
+        interval = self.lease.total_seconds() / 3
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.renew()
+                except Exception as error:
+                    logger.warning(f"Could not renew file claims: {error}")
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+            self.release()
@@ -1,5 +1,4 @@
 from configparser import ConfigParser
-from sqlalchemy import create_engine
 import os
 import logging
 
@@ -24,6 +23,9 @@ def get_db_engine():
     global _engine
     if _engine is not None:
         return _engine
+    # imported here so commands that never connect skip SQLAlchemy
+    from sqlalchemy import create_engine
+
     config = get_config()
 
     db_params = {}
@@ -1,63 +1,597 @@
+import io
 import os
 import logging
 import pandas as pd
-import datetime
+import sqlalchemy as sa
+from contextlib import nullcontext
+from datetime import date, datetime
+from . import partitions, report, rollups, seen_keys
 
 logger = logging.getLogger(__name__)
 
 
+WRITE_MODES = ("replace", "append", "upsert", "reload")
+KEY_COLUMNS = ("client", "date", "channel")
+MASTER_TABLES = ("ads_data", "performance_data", "clickstreams_data")
+DATE_TYPES = (date, datetime)
+COPY_ROWS = 50_000  # rows rendered to CSV per COPY statement
+STAGING_SUFFIX = "_next"  # replacements are built as <table>_next
+
+
+def sql_types(df):
+    """column types for creating a table from df.
+
+    Categoricals are stored as TEXT, date-only columns as DATE and 32-bit
+    counts as INTEGER, instead of whatever pandas would infer.
+    """
+    types = {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            types[column] = sa.Text()
+        elif column == "date" and pd.api.types.is_datetime64_dtype(dtype):
+            types[column] = sa.Date()
+        elif str(dtype).lower() in ("int8", "int16", "int32"):
+            types[column] = sa.Integer()
+    return types
+
+
+def ddl_lock(conn, name):
+    """wait for other processes creating name's tables, until commit.
+
+    Postgres only; two transactions creating the same table or partition
+    otherwise fail one another.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(
+            sa.text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": name},
+        )
+
+
 class DatabaseWriter:
-    def __init__(self, engine):
+    def __init__(
+        self,
+        engine,
+        mode="append",
+        key_columns=KEY_COLUMNS,
+        metrics=None,
+        natural_keys=None,
+        partitioned=False,
+        dedupe=True,
+    ):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Unknown write mode: {mode}")
         self.engine = engine
+        self.mode = mode
+        self.key_columns = list(key_columns)
+        self.metrics = metrics  # optional recorder with a stage() context
+        # table name -> columns identifying a row, which upserts merge
+        # on; with dedupe, rows whose key was loaded before are dropped
+        # from appends
+        self.natural_keys = dict(natural_keys or {})
+        self.dedupe = dedupe
+        # create new tables with daily partitions on Postgres
+        self.partitioned = partitioned
+
+    def _stage(self, name, **labels):
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.stage(name, **labels)
 
-    def load_to_database(self, df: pd.DataFrame, table_name: str):
-        logger.info(f"Attempting to load data for table: {table_name}")
+    def load_to_database(
+        self, df: pd.DataFrame, table_name: str, mode=None, cleared=None,
+    ):
+        """write df to table_name, returns whether it succeeded.
+
+        mode "reload" first removes the stored rows of df's clients on
+        df's days. cleared holds the (day, client) pairs removed for the
+        earlier batches of the same file, which are left alone, and df's
+        pairs are added to it.
+        """
+        mode = mode or self.mode
+        logger.info(f"Attempting to {mode} data for table: {table_name}")
 
         try:
             if self.engine is not None:
-                df.to_sql(
-                    name=table_name,
-                    con=self.engine,
-                    if_exists="replace",
-                    index=False
-                )
+                with self._stage(
+                    "write", table=table_name, mode=mode
+                ) as stage, self.engine.begin() as conn:
+                    self._write(conn, df, table_name, mode, cleared)
+                    stage["rows"] = len(df)
 
                 logger.info(f"Sucessfully wrote:"
                             f"{len(df)} rows to {table_name}")
+                return True
             else:
                 logger.error(f"Error writing dataframe to {table_name}.")
         except Exception as error:
             print(f"Unexpected error occurred: {error}")
+        return False
 
-    def build_metadata(file, data_directory, df):
-        metadata_row = {
-            "file_name": file,
-            "file_type": os.path.splitext(file)[-1].replace(".", ""),
-            "ingestion_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "row_count": len(df),
-            "columns": ",".join(df.columns),
-            "source_path": os.path.join(data_directory, file),
-        }
+    def _write(self, conn, df, table_name, mode, cleared=None):
+        if self._creates_tables(conn, df, table_name, mode):
+            ddl_lock(conn, table_name)
 
-        df = pd.concat([df, pd.DataFrame([metadata_row])], ignore_index=True)
+        if mode == "reload":
+            self._clear_batch(conn, df, table_name, cleared)
+            mode = "append"
 
-        return df
+        df = self._drop_loaded(conn, df, table_name, mode)
+        # backfill a missing rollup before this batch lands in the table
+        rollup = rollups.ensure_rollup(conn, table_name)
 
-    def report_table(engine):
-        print("\n --- Reported Metric Data ---")
+        if mode == "replace" and conn.dialect.name == "postgresql":
+            self._replace_by_swap(conn, df, table_name)
+            if rollup is not None:
+                rollups.clear(conn, rollup)
+        elif mode == "replace":
+            if self.partitioned and partitions.can_partition(conn, df):
+                quote = conn.dialect.identifier_preparer.quote
+                conn.execute(sa.text(
+                    f"DROP TABLE IF EXISTS {quote(table_name)}"
+                ))
+                self._ensure_table(conn, df, table_name)
+            else:
+                df.head(0).to_sql(
+                    table_name,
+                    conn,
+                    if_exists="replace",
+                    index=False,
+                    dtype=sql_types(df),
+                )
+            self._add_partitions(conn, df, table_name)
+            self._copy(conn, df, table_name)
+            self._create_key_index(conn, table_name, df.columns)
+            if rollup is not None:
+                rollups.clear(conn, rollup)
+        elif mode == "append":
+            self._ensure_table(conn, df, table_name)
+            self._add_partitions(conn, df, table_name)
+            self._copy(conn, df, table_name)
+        elif mode == "upsert":
+            self._ensure_table(conn, df, table_name)
+            self._add_partitions(conn, df, table_name)
+            self._upsert(conn, df, table_name, rollup)
+            return
+        else:
+            raise ValueError(f"Unknown write mode: {mode}")
+
+        if rollup is not None:
+            rollups.add_totals(conn, rollup, rollups.batch_totals(df, rollup))
+
+    def _drop_loaded(self, conn, df, table_name, mode):
+        """record df's natural keys and drop rows loaded by earlier batches.
+
+        Upserts keep every row, since re-delivered rows should overwrite
+        the stored ones. A replace starts the table's history afresh.
+        """
+        key = self._dedupe_key(table_name)
+        if not key or not all(column in df.columns for column in key):
+            return df
+
+        if mode == "replace":
+            seen_keys.clear(conn, table_name)
+        seen_keys.ensure(
+            conn, table_name, key, self._copy, backfill=mode != "replace"
+        )
+        new = seen_keys.claim(conn, table_name, df, key, self._copy)
+        if mode == "upsert" or new.all():
+            return df
+
+        logger.info(
+            f"Skipping {len(df) - new.sum()} rows already loaded"
+            f" into {table_name}"
+        )
+        return df[new]
+
+    def _dedupe_key(self, table_name):
+        """the natural key appends to table_name are deduplicated on"""
+        return self.natural_keys.get(table_name) if self.dedupe else None
+
+    def _upsert_key(self, table_name):
+        """the columns identifying table_name's rows, the join keys when
+        it has no natural key"""
+        return list(self.natural_keys.get(table_name, self.key_columns))
+
+    def _ensure_table(self, conn, df, table_name):
+        """create table_name for df with its key index, if it is missing.
+
+        The index is only built with the table: CREATE INDEX on a table
+        other processes are writing to waits on their row locks while
+        holding ours, and Postgres aborts one of them as a deadlock.
+        Partitions inherit it.
+        """
+        if sa.inspect(conn).has_table(table_name):
+            return
+        if self.partitioned and partitions.can_partition(conn, df):
+            partitions.create_table(conn, df, table_name, sql_types(df))
+        else:
+            df.head(0).to_sql(
+                table_name, conn, index=False, dtype=sql_types(df)
+            )
+        self._create_key_index(conn, table_name, df.columns)
+
+    def _replace_by_swap(self, conn, df, table_name):
+        """build table_name afresh beside the live table, then swap it in.
+
+        The new table is filled and indexed while readers keep using the
+        old one. Only the closing DROP and RENAME lock the live table, and
+        only until the surrounding transaction commits. The table stays
+        logged: SET LOGGED would write all of it to the WAL again, which
+        costs more than the COPY into an UNLOGGED table saves.
+        """
+        quote = conn.dialect.identifier_preparer.quote
+        staging = f"{table_name}{STAGING_SUFFIX}"
+        conn.execute(sa.text(f"DROP TABLE IF EXISTS {quote(staging)}"))
+
+        if self.partitioned and partitions.can_partition(conn, df):
+            partitions.create_table(conn, df, staging, sql_types(df))
+            partitions.ensure_partitions(
+                conn, staging, partitions.batch_days(df)
+            )
+        else:
+            df.head(0).to_sql(
+                staging, conn, index=False, dtype=sql_types(df)
+            )
+        self._copy(conn, df, staging)
+        self._create_key_index(conn, staging, df.columns)
+
+        # the swap: from here the live table stays locked until commit
+        conn.execute(sa.text(f"DROP TABLE IF EXISTS {quote(table_name)}"))
+        conn.execute(sa.text(
+            f"ALTER TABLE {quote(staging)} RENAME TO {quote(table_name)}"
+        ))
+        # partitions and indexes take the names the old table's had
+        related = conn.execute(sa.text(
+            "SELECT relname, relkind FROM pg_class"
+            " WHERE relnamespace = to_regnamespace(current_schema())"
+            " AND left(relname, :length) = :prefix"
+        ), {"length": len(staging) + 1, "prefix": f"{staging}_"})
+        for name, kind in related.fetchall():
+            statement = "INDEX" if kind in ("i", "I") else "TABLE"
+            conn.execute(sa.text(
+                f"ALTER {statement} {quote(name)} RENAME TO"
+                f" {quote(table_name + name[len(staging):])}"
+            ))
+
+    def _creates_tables(self, conn, df, table_name, mode):
+        """whether writing df may create tables or partitions on Postgres"""
+        if conn.dialect.name != "postgresql":
+            return False
+        if mode == "replace" or not sa.inspect(conn).has_table(table_name):
+            return True
+        return self._partitioned(conn, table_name) and bool(
+            partitions.missing_days(
+                conn, table_name, partitions.batch_days(df)
+            )
+        )
+
+    def _partitioned(self, conn, table_name):
+        return (
+            self.partitioned
+            and conn.dialect.name == "postgresql"
+            and partitions.is_partitioned(conn, table_name)
+        )
+
+    def _add_partitions(self, conn, df, table_name):
+        """create the partitions df's rows will be routed to"""
+        if self._partitioned(conn, table_name):
+            partitions.ensure_partitions(
+                conn, table_name, partitions.batch_days(df)
+            )
+
+    def _clear_batch(self, conn, df, table_name, cleared=None):
+        """remove the stored rows of df's clients on each of df's days.
+
+        Files are per client, so other clients' rows for the same days
+        stay. Without a client column whole days are removed.
+        """
+        if "date" not in df.columns:
+            raise ValueError(f"Reloading {table_name} needs a date")
+        cleared = set() if cleared is None else cleared
 
-        query1 = (
-            "SELECT channel, SUM(spend_usd) FROM"
-            "ads_data GROUP BY channel"
+        days = pd.to_datetime(
+            df["date"], errors="coerce", format="mixed"
+        ).dt.date
+        if "client" in df.columns:
+            valid = days.notna() & df["client"].notna()
+            pairs = set(zip(days[valid], df["client"][valid].astype(str)))
+        else:
+            pairs = {(day, None) for day in days.dropna()}
+        pairs -= cleared
+        cleared |= pairs
+        if not pairs or not sa.inspect(conn).has_table(table_name):
+            return
+
+        by_day = {}
+        for day, client in pairs:
+            by_day.setdefault(day, set()).add(client)
+        for day, clients in sorted(by_day.items()):
+            self._clear_day(
+                conn, table_name, day, None if None in clients else clients
+            )
+
+    def _clear_day(self, conn, table_name, day, clients=None):
+        """remove table_name's rows of clients dated day, keeping rollups
+        and keys. Without clients the whole day is removed."""
+        quote = conn.dialect.identifier_preparer.quote
+        where = []
+        if clients is not None:
+            names = ", ".join(
+                "'" + client.replace("'", "''") + "'"
+                for client in sorted(clients)
+            )
+            where.append(f"t.{quote('client')} IN ({names})")
+        if self._partitioned(conn, table_name):
+            partition = partitions.partition_name(table_name, day)
+            if not sa.inspect(conn).has_table(partition):
+                return
+            target = quote(partition)
+        else:
+            target = quote(table_name)
+            where.append(f"date(t.{quote('date')}) = '{day.isoformat()}'")
+
+        if where:
+            where = " AND ".join(where)
+            rows = f"{target} t WHERE {where}"
+            remove = f"DELETE FROM {target} AS t WHERE {where}"
+        else:
+            rows = f"{target} t"
+            remove = f"TRUNCATE {target}"
+
+        rollup = rollups.ensure_rollup(conn, table_name)
+        if rollup is not None:
+            rollups.add_totals(conn, rollup, rollups.stored_totals(
+                conn, rollup, table_name, source=rows, alias="t"
+            ), sign=-1)
+
+        key = self._dedupe_key(table_name)
+        if key:
+            seen_keys.ensure(conn, table_name, key, self._copy)
+            seen_keys.forget(conn, table_name, rows, key, self._copy)
+
+        conn.execute(sa.text(remove))
+        logger.info(
+            f"Cleared {day} from {table_name}"
+            + (f" for {', '.join(sorted(clients))}" if clients else "")
+        )
+
+    def _create_key_index(self, conn, table_name, columns, unique=False):
+        """index the join keys, which the master report query joins on.
+
+        The unique index upserts merge on covers the table's whole
+        natural key instead.
+        """
+        key_columns = (
+            self._upsert_key(table_name) if unique else self.key_columns
+        )
+        if not all(key in columns for key in key_columns):
+            return
+
+        quote = conn.dialect.identifier_preparer.quote
+        keys = ", ".join(quote(key) for key in key_columns)
+        name = f"{table_name}_{'upsert_idx' if unique else 'keys_idx'}"
+        indexes = sa.inspect(conn).get_indexes(table_name)
+        if any(index["name"] == name for index in indexes):
+            return  # no CREATE INDEX, which would lock out other writers
+        ddl_lock(conn, table_name)
+        conn.execute(sa.text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS"
+            f" {quote(name)} ON {quote(table_name)} ({keys})"
+        ))
+
+    def _copy(self, conn, df, table_name):
+        """bulk load df with COPY FROM STDIN, or batched INSERTs elsewhere"""
+        if conn.dialect.name != "postgresql":
+            df.to_sql(
+                table_name,
+                conn,
+                if_exists="append",
+                index=False,
+                method="multi",
+                chunksize=1000,
+            )
+            return
+
+        quote = conn.dialect.identifier_preparer.quote
+        columns = ", ".join(quote(column) for column in df.columns)
+        statement = (
+            f"COPY {quote(table_name)} ({columns})"
+            f" FROM STDIN WITH (FORMAT csv)"
+        )
+
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(df), COPY_ROWS):
+                buffer = io.StringIO()
+                df.iloc[start:start + COPY_ROWS].to_csv(
+                    buffer, index=False, header=False
+                )
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+        finally:
+            cursor.close()
+
+    def _upsert(self, conn, df, table_name, rollup=None):
+        """stage df in a temp table and merge it on table_name's natural
+        key, so rows only overwrite the stored rows they correct"""
+        key_columns = self._upsert_key(table_name)
+        missing = [key for key in key_columns if key not in df.columns]
+        if missing:
+            raise ValueError(f"Upsert into {table_name} needs {missing}")
+
+        quote = conn.dialect.identifier_preparer.quote
+        keys = ", ".join(quote(key) for key in key_columns)
+        self._create_key_index(conn, table_name, df.columns, unique=True)
+
+        staging = f"{table_name}_staging"
+        conn.execute(sa.text(f"DROP TABLE IF EXISTS {quote(staging)}"))
+        conn.execute(sa.text(
+            f"CREATE TEMPORARY TABLE {quote(staging)} AS"
+            f" SELECT * FROM {quote(table_name)} WHERE 1 = 0"
+        ))
+
+        # a statement may only touch each key once
+        df = df.drop_duplicates(subset=key_columns, keep="last")
+        self._copy(conn, df, staging)
+
+        if rollup is not None:
+            # rows about to be overwritten leave the rollup first
+            matches = " AND ".join(
+                f"t.{quote(key)} = s.{quote(key)}" for key in key_columns
             )
-        result1 = pd.read_sql(query1, engine)
-        print("\n--- Spend by Channel ---")
-        print(result1.to_string())
+            rollups.add_totals(conn, rollup, rollups.stored_totals(
+                conn,
+                rollup,
+                table_name,
+                source=(
+                    f"{quote(table_name)} t"
+                    f" JOIN {quote(staging)} s ON {matches}"
+                ),
+                alias="t",
+            ), sign=-1)
+            rollups.add_totals(conn, rollup, rollups.batch_totals(df, rollup))
 
-        query2 = (
-            "SELECT channel, SUM(clicks), SUM(conversions) FROM"
-            "performance_data GROUP BY channel"
+        columns = ", ".join(quote(column) for column in df.columns)
+        updates = ", ".join(
+            f"{quote(column)} = excluded.{quote(column)}"
+            for column in df.columns
+            if column not in key_columns
+        )
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        conn.execute(sa.text(
+            f"INSERT INTO {quote(table_name)} ({columns})"
+            f" SELECT {columns} FROM {quote(staging)} WHERE true"
+            f" ON CONFLICT ({keys}) {action}"
+        ))
+        conn.execute(sa.text(f"DROP TABLE {quote(staging)}"))
+
+    def iter_master(self, chunksize, since=None, until=None):
+        """stream the joined master report out of the database in chunks.
+
+        since and until limit the report to dates in [since, until).
+        """
+        with self.engine.connect() as conn:
+            query = self.master_query(conn, since, until)
+            if query is None:
+                return
+            conn = conn.execution_options(stream_results=True)
+            # ISO strings compare as dates on Postgres and SQLite alike
+            params = {
+                "since": since and str(since),
+                "until": until and str(until),
+            }
+            yield from pd.read_sql(
+                sa.text(query), conn, params=params, chunksize=chunksize
+            )
+
+    def master_columns(self):
+        """the master report's columns and their Python types, in order.
+
+        The types are those of the source columns, so they hold however
+        many NULLs a chunk of the report has. None marks a type with no
+        Python equivalent, and dates are str on SQLite, which hands them
+        over as the text it stores.
+        """
+        with self.engine.connect() as conn:
+            tables = self._master_tables(conn)
+            dialect = conn.dialect.name
+        if MASTER_TABLES[0] not in tables:
+            return {}
+        columns = {}
+        for table_name, types in tables.items():
+            for name, type_ in types.items():
+                if name in columns:
+                    continue
+                try:
+                    python_type = type_.python_type
+                except NotImplementedError:
+                    python_type = None
+                if dialect == "sqlite" and python_type in DATE_TYPES:
+                    python_type = str
+                columns[name] = python_type
+        return columns
+
+    def _master_tables(self, conn):
+        """{table: {column: SQL type}} of the master tables that exist"""
+        inspector = sa.inspect(conn)
+        tables = {}
+        for table_name in MASTER_TABLES:
+            if inspector.has_table(table_name):
+                columns = inspector.get_columns(table_name)
+                types = {col["name"]: col["type"] for col in columns}
+                if all(key in types for key in self.key_columns):
+                    tables[table_name] = types
+        return tables
+
+    def master_query(self, conn, since=None, until=None):
+        """SQL for ads LEFT JOIN performance LEFT JOIN clickstreams.
+
+        Tables that are missing, or lack a key column, are left out. Keys
+        stored with different types in two tables are cast before being
+        compared, dates as DATE and anything else as TEXT. With since or
+        until, every table is filtered on its own date column as well,
+        so Postgres only scans the partitions in range.
+        """
+        quote = conn.dialect.identifier_preparer.quote
+        tables = {
+            table_name: {name: str(type_) for name, type_ in types.items()}
+            for table_name, types in self._master_tables(conn).items()
+        }
+
+        base = MASTER_TABLES[0]
+        if base not in tables:
+            return None
+
+        def date_range(table_name):
+            column = f"{quote(table_name)}.{quote('date')}"
+            return (
+                ([f"{column} >= :since"] if since is not None else [])
+                + ([f"{column} < :until"] if until is not None else [])
             )
-        result2 = pd.read_sql(query2, engine)
-        print("\n--- Total clicks and conversions by Channel ---")
-        print(result2.to_string())
+
+        select = [f"{quote(base)}.*"]
+        joins = []
+        for table_name, types in tables.items():
+            if table_name == base:
+                continue
+            select += [
+                f"{quote(table_name)}.{quote(column)}"
+                for column in types
+                if column not in self.key_columns
+            ]
+            conditions = []
+            for key in self.key_columns:
+                left = f"{quote(base)}.{quote(key)}"
+                right = f"{quote(table_name)}.{quote(key)}"
+                if types[key] != tables[base][key]:
+                    as_type = "DATE" if key == "date" else "TEXT"
+                    left = f"CAST({left} AS {as_type})"
+                    right = f"CAST({right} AS {as_type})"
+                conditions.append(f"{left} = {right}")
+            conditions += date_range(table_name)
+            joins.append(
+                f"LEFT JOIN {quote(table_name)}"
+                f" ON {' AND '.join(conditions)}"
+            )
+
+        where = date_range(base)
+        return (
+            f"SELECT {', '.join(select)} FROM {quote(base)} {' '.join(joins)}"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+        )
+
+    @staticmethod
+    def metadata_row(file, data_directory, row_count, columns):
+        return {
+            "file_name": file,
+            "file_type": os.path.splitext(file)[-1].replace(".", ""),
+            "ingestion_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "row_count": row_count,
+            "columns": ",".join(columns),
+            "source_path": os.path.join(data_directory, file),
+        }
+
+    def report_table(engine):
+        """print spend, clicks and conversions by channel, see report.py"""
+        report.report_table(engine)
@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import sqlalchemy as sa
+from datetime import datetime
+from .database_writer import DatabaseWriter, ddl_lock
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1 << 20
+
+metadata = sa.MetaData()
+
+manifest_table = sa.Table(
+    "ingestion_manifest",
+    metadata,
+    sa.Column("source_path", sa.Text, primary_key=True),
+    sa.Column("file_name", sa.Text, nullable=False),
+    sa.Column("file_type", sa.Text),
+    sa.Column("file_size", sa.BigInteger, nullable=False),
+    sa.Column("mtime_ns", sa.BigInteger, nullable=False),
+    sa.Column("content_hash", sa.Text, nullable=False),
+    sa.Column("table_name", sa.Text),
+    sa.Column("row_count", sa.BigInteger),
+    sa.Column("columns", sa.Text),
+    sa.Column("ingestion_time", sa.DateTime),
+)
+
+
+def content_hash(fullpath):
+    """sha256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(fullpath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """Postgres record of which raw files have been loaded, and as what.
+
+    A file is skipped when its size and mtime match the manifest. When
+    only the mtime moved, the content hash decides, so touched or
+    re-copied files are not reloaded.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._fingerprints = {}
+        with engine.begin() as conn:
+            ddl_lock(conn, manifest_table.name)
+            metadata.create_all(conn, tables=[manifest_table])
+
+    def pending(self, paths):
+        """the subset of paths that are new or changed since their last load"""
+        paths = list(paths)
+        with self.engine.connect() as conn:
+            known = {
+                row.source_path: row
+                for row in conn.execute(sa.select(manifest_table))
+            }
+
+        pending = []
+        for fullpath in paths:
+            stat = os.stat(fullpath)
+            entry = known.get(fullpath)
+            fingerprint = {
+                "file_size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+
+            if entry is not None and entry.file_size == stat.st_size:
+                if entry.mtime_ns == stat.st_mtime_ns:
+                    continue
+                fingerprint["content_hash"] = content_hash(fullpath)
+                if entry.content_hash == fingerprint["content_hash"]:
+                    self._touch(fullpath, fingerprint)
+                    continue
+
+            self._fingerprints[fullpath] = fingerprint
+            pending.append(fullpath)
+
+        logger.info(
+            f"{len(pending)} of {len(paths)} files are new or changed."
+        )
+        return pending
+
+    def record(self, fullpath, table_name, row_count, columns):
+        """store a successful load of fullpath in the manifest"""
+        fingerprint = self._fingerprints.pop(fullpath, None)
+        if fingerprint is None:
+            stat = os.stat(fullpath)
+            fingerprint = {
+                "file_size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        if "content_hash" not in fingerprint:
+            fingerprint["content_hash"] = content_hash(fullpath)
+
+        data_directory, file = os.path.split(fullpath)
+        row = DatabaseWriter.metadata_row(
+            file, data_directory, row_count, columns
+        )
+        row.update(
+            fingerprint, table_name=table_name, ingestion_time=datetime.now()
+        )
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                manifest_table.delete().where(
+                    manifest_table.c.source_path == row["source_path"]
+                )
+            )
+            conn.execute(manifest_table.insert().values(**row))
+
+    def _touch(self, fullpath, fingerprint):
+        with self.engine.begin() as conn:
+            conn.execute(
+                manifest_table.update()
+                .where(manifest_table.c.source_path == fullpath)
+                .values(mtime_ns=fingerprint["mtime_ns"])
+            )
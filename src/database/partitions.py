@@ -0,0 +1,88 @@
+import logging
+import pandas as pd
+import sqlalchemy as sa
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "date"
+
+
+def partition_name(table_name, day):
+    return f"{table_name}_p{day:%Y%m%d}"
+
+
+def can_partition(conn, df):
+    """whether a table for df can be range partitioned by day"""
+    return (
+        conn.dialect.name == "postgresql"
+        and PARTITION_COLUMN in df.columns
+        and pd.api.types.is_datetime64_dtype(df[PARTITION_COLUMN])
+    )
+
+
+def is_partitioned(conn, table_name):
+    return conn.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p"
+        " JOIN pg_class c ON c.oid = p.partrelid"
+        " WHERE c.relname = :table_name"
+        " AND c.relnamespace = to_regnamespace(current_schema())"
+    ), {"table_name": table_name}).first() is not None
+
+
+def create_table(conn, df, table_name, column_types):
+    """create table_name for df, partitioned by range of PARTITION_COLUMN.
+
+    pandas picks the column types on a throwaway template table, which
+    the partitioned table is then declared LIKE. Rows without a date go
+    to a default partition.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    template = f"{table_name}_template"
+    df.head(0).to_sql(
+        template, conn, if_exists="replace", index=False, dtype=column_types
+    )
+    conn.execute(sa.text(
+        f"CREATE TABLE {quote(table_name)} (LIKE {quote(template)})"
+        f" PARTITION BY RANGE ({quote(PARTITION_COLUMN)})"
+    ))
+    conn.execute(sa.text(f"DROP TABLE {quote(template)}"))
+    conn.execute(sa.text(
+        f"CREATE TABLE {quote(f'{table_name}_default')}"
+        f" PARTITION OF {quote(table_name)} DEFAULT"
+    ))
+    logger.info(f"Created {table_name} partitioned by {PARTITION_COLUMN}")
+
+
+def missing_days(conn, table_name, days):
+    """the days without a daily partition of table_name yet, in order"""
+    existing = {
+        row[0] for row in conn.execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " JOIN pg_class p ON p.oid = i.inhparent"
+            " WHERE p.relname = :table_name"
+        ), {"table_name": table_name})
+    }
+    return [
+        day for day in sorted(set(days))
+        if partition_name(table_name, day) not in existing
+    ]
+
+
+def ensure_partitions(conn, table_name, days):
+    """create the daily partitions of table_name that days fall into"""
+    quote = conn.dialect.identifier_preparer.quote
+    for day in missing_days(conn, table_name, days):
+        name = partition_name(table_name, day)
+        conn.execute(sa.text(
+            f"CREATE TABLE {quote(name)} PARTITION OF {quote(table_name)}"
+            f" FOR VALUES FROM ('{day.isoformat()}')"
+            f" TO ('{(day + timedelta(days=1)).isoformat()}')"
+        ))
+
+
+def batch_days(df):
+    """the distinct days in df's partition column"""
+    days = pd.to_datetime(df[PARTITION_COLUMN]).dropna().dt.date
+    return days.unique()
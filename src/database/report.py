@@ -0,0 +1,69 @@
+import sqlalchemy as sa
+
+# fact table -> its rollup, as declared in rollups.ROLLUPS; named here so
+# the report needs only SQLAlchemy and starts without pandas
+ROLLUP_TABLES = {
+    "ads_data": "ads_daily_rollup",
+    "performance_data": "performance_daily_rollup",
+}
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, 6)  # hide float summing noise
+    return str(value)
+
+
+def format_table(columns, rows):
+    """rows as right-aligned text columns under a header"""
+    cells = [[str(column) for column in columns]]
+    cells += [[_format_value(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in cells
+    )
+
+
+def report_table(engine):
+    """print spend, clicks and conversions by channel.
+
+    Totals come from the daily rollups, which stay small however
+    large the fact tables grow. A table written before rollups
+    existed is read directly.
+    """
+    print("\n --- Reported Metric Data ---")
+
+    inspector = sa.inspect(engine)
+    ads_table, performance_table = (
+        ROLLUP_TABLES[table_name]
+        if inspector.has_table(ROLLUP_TABLES[table_name])
+        else table_name
+        for table_name in ("ads_data", "performance_data")
+    )
+
+    queries = (
+        (
+            "Spend by Channel",
+            "SELECT channel, SUM(spend_usd) AS spend_usd FROM"
+            f" {ads_table} GROUP BY channel ORDER BY channel",
+        ),
+        (
+            "Total clicks and conversions by Channel",
+            "SELECT channel, SUM(clicks) AS clicks,"
+            f" SUM(conversions) AS conversions FROM {performance_table}"
+            " GROUP BY channel ORDER BY channel",
+        ),
+    )
+    with engine.connect() as conn:
+        for table_name, (title, query) in zip(
+            (ads_table, performance_table), queries
+        ):
+            print(f"\n--- {title} ---")
+            if not inspector.has_table(table_name):
+                print(f"No {table_name} table yet.")
+                continue
+            result = conn.execute(sa.text(query))
+            print(format_table(list(result.keys()), result.fetchall()))
@@ -0,0 +1,143 @@
+import logging
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEYS = ("channel", "date")
+INSERT_ROWS = 500  # rollup rows per INSERT statement
+
+metadata = sa.MetaData()
+
+ads_rollup = sa.Table(
+    "ads_daily_rollup",
+    metadata,
+    sa.Column("channel", sa.Text, primary_key=True),
+    sa.Column("date", sa.Date, primary_key=True),
+    sa.Column("spend_usd", sa.Float, nullable=False),
+    sa.Column("row_count", sa.BigInteger, nullable=False),
+)
+
+performance_rollup = sa.Table(
+    "performance_daily_rollup",
+    metadata,
+    sa.Column("channel", sa.Text, primary_key=True),
+    sa.Column("date", sa.Date, primary_key=True),
+    sa.Column("clicks", sa.BigInteger, nullable=False),
+    sa.Column("conversions", sa.BigInteger, nullable=False),
+    sa.Column("row_count", sa.BigInteger, nullable=False),
+)
+
+# fact table -> rollup table kept in step with it
+ROLLUPS = {
+    "ads_data": ads_rollup,
+    "performance_data": performance_rollup,
+}
+
+INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _measures(rollup):
+    """the summed columns of a rollup, without row_count"""
+    return [
+        column.name for column in rollup.columns
+        if column.name not in (*ROLLUP_KEYS, "row_count")
+    ]
+
+
+def _by_day(totals):
+    # the same day may arrive as a date, a timestamp or a string
+    totals["date"] = pd.to_datetime(totals["date"], format="mixed").dt.date
+    return totals.groupby(list(ROLLUP_KEYS), observed=True, as_index=False)
+
+
+def batch_totals(df, rollup):
+    """per channel and day totals of the rows in df"""
+    if not all(key in df.columns for key in ROLLUP_KEYS):
+        return None
+
+    columns = _measures(rollup)
+    totals = df.reindex(columns=[*ROLLUP_KEYS, *columns])
+    totals[columns] = totals[columns].apply(pd.to_numeric, errors="coerce")
+    totals["row_count"] = 1
+    return _by_day(totals).sum(numeric_only=True)
+
+
+def stored_totals(conn, rollup, table_name, source=None, alias=None):
+    """per channel and day totals of rows already in the database.
+
+    source is the FROM clause to total, table_name by default. With a
+    join, alias names the side holding table_name's rows.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    source = source or quote(table_name)
+    prefix = f"{alias}." if alias else ""
+    present = {
+        column["name"] for column in sa.inspect(conn).get_columns(table_name)
+    }
+
+    keys = ", ".join(f"{prefix}{quote(key)}" for key in ROLLUP_KEYS)
+    totals = ", ".join(
+        f"SUM({prefix}{quote(column)}) AS {quote(column)}"
+        if column in present else f"0 AS {quote(column)}"
+        for column in _measures(rollup)
+    )
+    totals = pd.read_sql(sa.text(
+        f"SELECT {keys}, {totals}, COUNT(*) AS row_count"
+        f" FROM {source} GROUP BY {keys}"
+    ), conn)
+    if totals.empty:
+        return totals
+    return _by_day(totals).sum(numeric_only=True)
+
+
+def add_totals(conn, rollup, totals, sign=1):
+    """add totals to the rollup, or take them away with sign=-1"""
+    if totals is None or totals.empty:
+        return
+
+    columns = [*_measures(rollup), "row_count"]
+    totals = totals.dropna(subset=list(ROLLUP_KEYS)).copy()
+    for column in columns:
+        values = totals[column].fillna(0) * sign
+        if isinstance(rollup.c[column].type, sa.Integer):
+            values = values.round().astype("int64")
+        totals[column] = values
+    rows = totals[[*ROLLUP_KEYS, *columns]].astype(object).to_dict("records")
+
+    insert = INSERTS[conn.dialect.name]
+    for start in range(0, len(rows), INSERT_ROWS):
+        statement = insert(rollup).values(rows[start:start + INSERT_ROWS])
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEYS),
+            set_={
+                column: rollup.c[column] + statement.excluded[column]
+                for column in columns
+            },
+        ))
+
+
+def ensure_rollup(conn, table_name):
+    """the rollup kept for table_name, created and backfilled if missing.
+
+    Returns None when table_name has no rollup.
+    """
+    rollup = ROLLUPS.get(table_name)
+    if rollup is None:
+        return None
+    if sa.inspect(conn).has_table(rollup.name):
+        return rollup
+
+    metadata.create_all(conn, tables=[rollup])
+    if sa.inspect(conn).has_table(table_name):
+        logger.info(f"Backfilling {rollup.name} from {table_name}")
+        add_totals(conn, rollup, stored_totals(conn, rollup, table_name))
+    return rollup
+
+
+def clear(conn, rollup):
+    conn.execute(rollup.delete())
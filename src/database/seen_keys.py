@@ -0,0 +1,137 @@
+import logging
+import pandas as pd
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# two independent 64-bit hashes make a 128-bit key, so distinct keys
+# effectively never collide however long the history gets
+HASH_KEYS = ("natural-key-hash", "natural-key-salt")  # 16 bytes each
+BACKFILL_ROWS = 100_000
+DATE_COLUMNS = ("date",)
+
+
+def key_table(table_name):
+    return f"{table_name}_keys"
+
+
+def key_hashes(df, columns):
+    """a (h1, h2) pair of int64 hashes per row of df's key columns.
+
+    Dates are hashed as days, so a date read back from the database
+    hashes the same as the parsed timestamp it was written from.
+    """
+    keys = df[list(columns)].copy()
+    for column in keys.columns:
+        if column in DATE_COLUMNS:
+            keys[column] = (
+                pd.to_datetime(keys[column], format="mixed")
+                .dt.normalize()
+                .astype("datetime64[ns]")
+            )
+    return pd.DataFrame({
+        f"h{i}": pd.util.hash_pandas_object(
+            keys, index=False, hash_key=hash_key
+        ).to_numpy().view("int64")
+        for i, hash_key in enumerate(HASH_KEYS, start=1)
+    }, index=df.index)
+
+
+def ensure(conn, table_name, columns, copy, backfill=True):
+    """create the key table for table_name, filled from rows already there.
+
+    copy(conn, df, table) bulk loads a frame, as DatabaseWriter._copy does.
+    """
+    name = key_table(table_name)
+    inspector = sa.inspect(conn)
+    if inspector.has_table(name):
+        return name
+
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(sa.text(
+        f"CREATE TABLE {quote(name)} (h1 BIGINT NOT NULL,"
+        f" h2 BIGINT NOT NULL, PRIMARY KEY (h1, h2))"
+    ))
+
+    if not backfill or not inspector.has_table(table_name):
+        return name
+    present = {column["name"] for column in inspector.get_columns(table_name)}
+    if not all(column in present for column in columns):
+        return name
+
+    logger.info(f"Backfilling {name} from {table_name}")
+    query = (
+        f"SELECT {', '.join(quote(column) for column in columns)}"
+        f" FROM {quote(table_name)}"
+    )
+    for chunk in pd.read_sql(
+        sa.text(query), conn, chunksize=BACKFILL_ROWS
+    ):
+        claim(conn, table_name, chunk, columns, copy)
+    return name
+
+
+def claim(conn, table_name, df, columns, copy):
+    """record df's keys as loaded.
+
+    Returns a boolean mask over df's rows, True where the key was new:
+    not loaded before and not repeated earlier in df.
+    """
+    hashes = key_hashes(df, columns)
+    first = ~hashes.duplicated().to_numpy()
+
+    quote = conn.dialect.identifier_preparer.quote
+    batch = f"{key_table(table_name)}_batch"
+    conn.execute(sa.text(f"DROP TABLE IF EXISTS {quote(batch)}"))
+    conn.execute(sa.text(
+        f"CREATE TEMPORARY TABLE {quote(batch)} (h1 BIGINT, h2 BIGINT)"
+    ))
+    copy(conn, hashes[first], batch)
+    # only keys that were not there yet come back from RETURNING; keys
+    # go in sorted, so writers sharing keys wait on each other in the
+    # same order instead of deadlocking
+    new = conn.execute(sa.text(
+        f"INSERT INTO {quote(key_table(table_name))} (h1, h2)"
+        f" SELECT h1, h2 FROM {quote(batch)} WHERE true ORDER BY h1, h2"
+        f" ON CONFLICT DO NOTHING RETURNING h1, h2"
+    )).fetchall()
+    conn.execute(sa.text(f"DROP TABLE {quote(batch)}"))
+
+    new = pd.MultiIndex.from_tuples(
+        [tuple(row) for row in new], names=["h1", "h2"]
+    ) if new else pd.MultiIndex.from_arrays([[], []], names=["h1", "h2"])
+    return first & pd.MultiIndex.from_frame(hashes).isin(new)
+
+
+def forget(conn, table_name, source, columns, copy):
+    """drop the keys of the rows selected by the FROM clause source.
+
+    source names table_name's rows as t, e.g. "ads_data t WHERE ...".
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    name = key_table(table_name)
+    batch = f"{name}_batch"
+    query = (
+        f"SELECT {', '.join(f't.{quote(column)}' for column in columns)}"
+        f" FROM {source}"
+    )
+    for chunk in pd.read_sql(sa.text(query), conn, chunksize=BACKFILL_ROWS):
+        conn.execute(sa.text(f"DROP TABLE IF EXISTS {quote(batch)}"))
+        conn.execute(sa.text(
+            f"CREATE TEMPORARY TABLE {quote(batch)} (h1 BIGINT, h2 BIGINT)"
+        ))
+        copy(conn, key_hashes(chunk, columns), batch)
+        conn.execute(sa.text(
+            f"DELETE FROM {quote(name)} WHERE EXISTS (SELECT 1"
+            f" FROM {quote(batch)} b WHERE b.h1 = {quote(name)}.h1"
+            f" AND b.h2 = {quote(name)}.h2)"
+        ))
+        conn.execute(sa.text(f"DROP TABLE {quote(batch)}"))
+
+
+def clear(conn, table_name):
+    """forget every key loaded into table_name"""
+    name = key_table(table_name)
+    if sa.inspect(conn).has_table(name):
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(sa.text(f"DELETE FROM {quote(name)}"))
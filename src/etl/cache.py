@@ -0,0 +1,185 @@
+# cache.py
+import hashlib
+import logging
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedFileCache:
+    """Parquet copies of loader output, keyed by source file and loader.
+
+    Entries are named <source>-<version>.parquet, where source hashes the
+    file path and version hashes the loader class, its version, its row
+    checks, and the file's size and mtime. Editing the file or bumping a
+    loader's version changes the name, so stale entries are never read
+    and are removed when the new one is written. The directory is kept
+    under max_bytes by evicting the least recently used entries.
+
+    Files loaded in chunks are cached a row group per chunk, under the
+    chunk size as well: duplicates are only dropped within a chunk, so
+    their rows can differ from the whole file's.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, loader, chunksize=0):
+        stat = os.stat(loader.fullpath)
+        source = _digest(os.path.abspath(loader.fullpath))
+        checks = getattr(loader.validator, "fingerprint", "off")
+        version = _digest(
+            f"{type(loader).__name__}:{loader.version}:{checks}"
+            f":{stat.st_size}:{stat.st_mtime_ns}"
+            + (f":chunks{chunksize}" if chunksize else "")
+        )
+        path = os.path.join(self.directory, f"{source}-{version}.parquet")
+        return source, path
+
+    def get(self, loader):
+        """the cached dataframe for loader's file, None on a miss"""
+        try:
+            _, path = self._entry(loader)
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logger.warning(f"Ignoring unreadable cache entry: {error}")
+            return None
+
+        os.utime(path)  # mark as recently used
+        logger.info(f"Loaded {os.path.basename(loader.fullpath)} from cache.")
+        return df
+
+    def put(self, loader, df):
+        """store df for loader's file and drop older entries for it"""
+        source, path = self._entry(loader)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as error:
+            logger.warning(
+                f"Could not cache {os.path.basename(loader.fullpath)}: {error}"
+            )
+            _remove(tmp_path)
+            return
+
+        self._drop_stale(source, path)
+
+    def get_chunks(self, loader, chunksize):
+        """the cached chunks of loader's file, None on a miss"""
+        try:
+            _, path = self._entry(loader, chunksize)
+            parquet = pq.ParquetFile(path)
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logger.warning(f"Ignoring unreadable cache entry: {error}")
+            return None
+
+        os.utime(path)  # mark as recently used
+        logger.info(f"Loaded {os.path.basename(loader.fullpath)} from cache.")
+        return _read_chunks(parquet, chunksize)
+
+    def put_chunks(self, loader, chunks, chunksize):
+        """pass chunks through, storing them for loader's file.
+
+        The entry is only kept once the last chunk has gone through, and
+        is given up if a chunk's columns do not fit the first one's.
+        """
+        source, path = self._entry(loader, chunksize)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        writer = None
+        failed = False
+        try:
+            for df in chunks:
+                if not failed:
+                    try:
+                        if writer is None:
+                            writer = pq.ParquetWriter(
+                                tmp_path, _chunk_schema(df)
+                            )
+                        writer.write_table(pa.Table.from_pandas(
+                            df, schema=writer.schema,
+                            preserve_index=False,
+                        ))
+                    except Exception as error:
+                        logger.warning(
+                            f"Could not cache"
+                            f" {os.path.basename(loader.fullpath)}: {error}"
+                        )
+                        failed = True
+                yield df
+            if writer is not None and not failed:
+                writer.close()
+                writer = None
+                os.replace(tmp_path, path)
+                self._drop_stale(source, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            _remove(tmp_path)
+
+    def _drop_stale(self, source, path):
+        """remove the other entries of source, then evict down to size"""
+        for name in os.listdir(self.directory):
+            stale = os.path.join(self.directory, name)
+            if name.startswith(f"{source}-") and stale != path:
+                _remove(stale)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".parquet"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(os.path.join(self.directory, name))
+            total -= size
+
+
+def _chunk_schema(df):
+    """the parquet schema for a file's chunks, from its first chunk"""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        # later chunks may have more categories than int8 codes hold
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(
+                pa.dictionary(pa.int32(), field.type.value_type)
+            ))
+    return schema
+
+
+def _read_chunks(parquet, chunksize):
+    """a parquet file's rows as dataframes of chunksize rows"""
+    for batch in parquet.iter_batches(batch_size=chunksize):
+        yield pa.Table.from_batches(
+            [batch], schema=parquet.schema_arrow
+        ).to_pandas()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -2,26 +2,158 @@
 # coding: utf-8
 # etl.py
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
+import codecs
+import mmap
 import os
-import re
 import json
 import logging
+from contextlib import contextmanager, nullcontext
+from .schemas import (
+    ADS_KEY,
+    ADS_REQUIRED,
+    ADS_SCHEMA,
+    CLICKSTREAMS_KEY,
+    CLICKSTREAMS_REQUIRED,
+    CLICKSTREAMS_SCHEMA,
+    PERFORMANCE_KEY,
+    PERFORMANCE_REQUIRED,
+    PERFORMANCE_SCHEMA,
+    apply_schema,
+    concat_frames,
+)
+from .sources import (
+    CLICKSTREAMS_FIELDS,
+    HEAD_SIZE,
+    JSON_EXTENSIONS,
+    check_ads_head,
+    check_clickstreams_head,
+    check_performance_head,
+    csv_header,
+    decompress,
+    read_head,
+    split_compression,
+)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNKSIZE = 100_000
+KEY_VALUE_REGEX = r"^\s*(?P<key>[^:]*?)\s*: (?P<value>.*)$"
+
+
+def _skip_whitespace(text, pos):
+    """index of the first non-whitespace character at or after pos"""
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+def _stream_lines(stream, chunksize, block_size):
+    """read a forward-only binary stream as chunks of chunksize lines.
+
+    The streaming counterpart of _line_slices, for files that cannot be
+    mapped, such as compressed ones.
+    """
+    buffer = bytearray()
+    lines = 0
+    for block in iter(lambda: stream.read(block_size), b""):
+        newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 0x0A)
+        start = 0
+        while lines + len(newlines) >= chunksize:
+            end = int(newlines[chunksize - lines - 1]) + 1
+            buffer += block[start:end]
+            yield buffer
+            buffer = bytearray()
+            newlines = newlines[chunksize - lines:]
+            start, lines = end, 0
+        buffer += block[start:]
+        lines += len(newlines)
+    if buffer:
+        yield buffer
+
+
+def _line_slices(data, chunksize, block_size):
+    """cut a bytes view into views of at most chunksize whole lines.
+
+    Newlines are found a block at a time with numpy, so the slices share
+    memory with data and no line is copied or decoded.
+    """
+    view = np.frombuffer(data, dtype=np.uint8)
+    start = end = lines = 0
+    while end < len(view):
+        newlines = np.flatnonzero(view[end:end + block_size] == 0x0A)
+        if lines + len(newlines) < chunksize:
+            lines += len(newlines)
+            end = min(end + block_size, len(view))
+            continue
+        end += int(newlines[chunksize - lines - 1]) + 1
+        yield data[start:end]
+        start, lines = end, 0
+    if start < len(view):
+        yield data[start:]
+
+
+def _string_columns(count):
+    """column types that keep every autogenerated csv column as text"""
+    return {f"f{i}": pa.string() for i in range(count)}
+
 
 class BaseLoader:
 
+    version = 4  # bump when a loader's output changes, to refresh caches
+    cache = None  # optional ParsedFileCache shared by loaders
+    schema = None  # declared column types, see schemas.py
+    natural_key = None  # columns identifying a row, see schemas.py
+    required = ()  # columns every row needs a value in, see schemas.py
+    date_format = None  # format of the schema's datetime columns
+    metrics = None  # optional MetricsRecorder timing each stage
+    profiler = None  # optional Profiler, see profiling.py
+    validator = None  # optional RowValidator quarantining bad rows
+    validated = False  # set when a pre-flight scan already checked the file
+    head_size = HEAD_SIZE  # bytes read to check headers
+
     def __init__(self, fullpath):
         """initializes instance variables of class"""
         self.fullpath = fullpath
+        # a vendor export like AD_SPEND_X_20250101.csv.gz is read as
+        # AD_SPEND_X_20250101.csv, decompressed on the fly
+        self.plain_name, self.compression = split_compression(
+            os.path.basename(fullpath)
+        )
+        self.rejected = 0  # rows set aside as invalid so far
+
+    def _stage(self, name):
+        """context timing one stage of this loader, when metrics are on"""
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.stage(
+            name,
+            file=os.path.basename(self.fullpath),
+            loader=type(self).__name__,
+        )
+
+    def _profile_session(self):
+        """a ProfileSession for this file's load, when profiling is on"""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.session("load", self.fullpath)
 
     def _validate_file(self):
         """validates filenames and file structure"""
-        if not os.path.exists(self.fullpath):
-            logger.error("File doesn't exists. Check folders. ")
-            raise FileNotFoundError(f"File in path {self.fullpath} not found.")
+        self.scan()
+
+    def scan(self):
+        """validate the file with a single open, returns its size in bytes"""
+        size, head = read_head(self.fullpath, self.head_size)
+        self._check_head(head)
+        return size
+
+    def _check_head(self, head):
+        """validates the filename and the first bytes of the file"""
 
     def _read_source(self):
         """read in files"""
@@ -29,6 +161,46 @@ class BaseLoader:
             content = f1.read()
             return content
 
+    def _read_chunks(self, chunksize):
+        """read in files as a sequence of raw chunks"""
+        yield self._read_source()
+
+    @contextmanager
+    def _open_stream(self):
+        """the file opened as a stream of decompressed bytes"""
+        with open(self.fullpath, "rb") as f:
+            with decompress(f, self.compression) as stream:
+                yield stream
+
+    def _read_blocks(self, block_size):
+        """the file's decompressed bytes, block_size bytes at a time"""
+        if self.compression is None:
+            data = self._map_source()
+            for start in range(0, len(data), block_size):
+                yield data[start:start + block_size]
+            return
+        with self._open_stream() as stream:
+            yield from iter(lambda: stream.read(block_size), b"")
+
+    def _map_source(self):
+        """the file as a read-only bytes view backed by mmap.
+
+        Pages are read in by the OS as the view is touched, so parsers
+        can walk a file larger than memory without copying it.
+        Compressed files cannot be mapped and are decompressed whole.
+        """
+        if self.compression is not None:
+            with self._open_stream() as stream:
+                return memoryview(stream.read())
+        with open(self.fullpath, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return memoryview(b"")  # empty files cannot be mapped
+            except OSError:
+                return memoryview(f.read())  # not a regular file
+        return memoryview(mapped)
+
     def _parse_records(self, raw):
         """parse data records"""
         raise NotImplementedError("Subclasses must implement method.")
@@ -41,7 +213,7 @@ class BaseLoader:
             if len(records) == 0:
                 return pd.DataFrame()
             if all(isinstance(item, pd.DataFrame) for item in records):
-                return pd.concat(records, ignore_index=True)
+                return concat_frames(records)
             elif all(isinstance(item, dict) for item in records):
                 return pd.DataFrame(records)
             else:
@@ -53,100 +225,366 @@ class BaseLoader:
             raise TypeError("Unsupported type for records in _to_dataframe")
 
     def _postprocess_df(self, df):
-        df = df.drop_duplicates()
+        # the columns as parsed; schema casts replace them in df
+        raw = dict(df.items()) if self.validator is not None else None
+        if self.schema is not None:
+            df = apply_schema(df, self.schema, self.date_format)
+        if self.validator is not None:
+            df = self._check_rows(df, raw)
+        key = self.natural_key
+        if key and all(column in df.columns for column in key):
+            df = df.drop_duplicates(subset=list(key))
+        else:
+            df = df.drop_duplicates()
         return df
 
+    def _check_rows(self, df, raw):
+        """quarantine the rows of df that fail the validator's checks"""
+        failed, reasons = self.validator.check(df, raw, self.required)
+        if not failed.any():
+            return df
+        rows = pd.DataFrame({
+            column: values.to_numpy()[failed]
+            for column, values in raw.items()
+        })
+        rows["reason"] = reasons.to_numpy()
+        self._reject(rows)
+        return df[~failed]
+
+    def _reject(self, rows):
+        """set aside rows that cannot be loaded, with a reason column"""
+        counts = rows["reason"].value_counts()
+        logger.warning(
+            f"Quarantined {len(rows)} rows of"
+            f" {os.path.basename(self.fullpath)}: "
+            + ", ".join(f"{n} {reason}" for reason, n in counts.items())
+        )
+        if self.validator is not None:
+            self.validator.quarantine(
+                self.fullpath, rows, append=self.rejected > 0
+            )
+        self.rejected += len(rows)
+
     def load(self):
         """load data for database"""
-        self._validate_file()
-        raw = self._read_source()
-        records = self._parse_records(raw)
-        df = self._to_dataframe(records)
-        df = self._postprocess_df(df)
+        session = self._profile_session()
+        try:
+            with session, self._stage("load") as stage:
+                df = self._load()
+                stage["rows"] = len(df)
+                stage["bytes"] = os.path.getsize(self.fullpath)
+        finally:
+            if self.profiler is not None:
+                session.save()
+        return df
+
+    def _load(self):
+        if self.cache is not None:
+            with self._stage("load.cache") as stage:
+                df = self.cache.get(self)
+                stage["rows"] = None if df is None else len(df)
+            if df is not None:
+                return df
+
+        if not self.validated:
+            with self._stage("load.validate"):
+                self._validate_file()
+        with self._stage("load.read") as stage:
+            raw = self._read_source()
+            if isinstance(raw, (str, bytes)):
+                stage["bytes"] = len(raw)
+        with self._stage("load.parse"):
+            records = self._parse_records(raw)
+        with self._stage("load.to_dataframe"):
+            df = self._to_dataframe(records)
+        with self._stage("load.postprocess") as stage:
+            df = self._postprocess_df(df)
+            stage["rows"] = len(df)
+
+        if self.cache is not None:
+            self.cache.put(self, df)
         return df
 
+    def iter_chunks(self, chunksize=DEFAULT_CHUNKSIZE):
+        """stream data for database as dataframes of at most chunksize rows.
+
+        Each chunk goes through parse and postprocess on its own, so
+        duplicates are only dropped within a chunk. With a cache, cached
+        files are read back from it, and files read to the end are
+        cached.
+        """
+        if self.cache is None:
+            yield from self._iter_chunks(chunksize)
+            return
+        with self._stage("load.cache"):
+            chunks = self.cache.get_chunks(self, chunksize)
+        if chunks is None:
+            chunks = self.cache.put_chunks(
+                self, self._iter_chunks(chunksize), chunksize
+            )
+        yield from chunks
+
+    def _iter_chunks(self, chunksize):
+        # the profile pauses while the consumer has the chunk
+        session = self._profile_session()
+        try:
+            with session:
+                if not self.validated:
+                    with self._stage("load.validate"):
+                        self._validate_file()
+                chunks = self._read_chunks(chunksize)
+            while True:
+                with session:
+                    with self._stage("chunk.read") as stage:
+                        raw = next(chunks, None)
+                        if isinstance(raw, pd.DataFrame):
+                            stage["rows"] = len(raw)
+                    if raw is None:
+                        return
+                    with self._stage("chunk.parse"):
+                        records = self._parse_records(raw)
+                    with self._stage("chunk.to_dataframe"):
+                        df = self._to_dataframe(records)
+                    with self._stage("chunk.postprocess") as stage:
+                        df = self._postprocess_df(df)
+                        stage["rows"] = len(df)
+                if not df.empty:
+                    yield df
+        finally:
+            if self.profiler is not None:
+                session.save()
+
 
 class CSVLoader(BaseLoader):
 
+    schema = ADS_SCHEMA
+    natural_key = ADS_KEY
+    required = ADS_REQUIRED
+
     def __init__(self, fullpath, delimiter=","):
         super().__init__(fullpath)
         self.delimiter = delimiter
         self.filename = os.path.basename(self.fullpath)
-        self.pattern = r"^AD_SPEND_[a-zA-Z0-9_]+_\d{8}.csv"
-
-    def _validate_file(self):
-        super()._validate_file()
-
-        if not self.filename.endswith(".csv"):
-            raise ValueError("Invalid file extension. Check file.")
-
-        if re.match(self.pattern, self.filename, re.IGNORECASE) is None:
-            logger.warning("Invalid CSV filename pattern. Check file.")
 
-        req_columns = ["Date", "Channel", "Spend_usd", "Client"]
-
-        try:
-            header = pd.read_csv(self.fullpath, nrows=0)  # get header row only
-            col_names = list(header.columns)
-
-            if not all(col in col_names for col in req_columns):
-                logger.warning(
-                    f"CSV file {self.filename}"
-                    f" is missing required columns. Skipping file.")
-            else:
-                logger.info(f"File {self.filename} passed validation check.")
-
-        except Exception as error:
-            logger.warning(f"File {self.filename}"
-                           f"encountered a header error: {error}."
-                           )
+    def _check_head(self, head):
+        check_ads_head(self.filename, head, self.delimiter)
 
     def _read_source(self):
-        return pd.read_csv(self.fullpath, sep=self.delimiter)
+        bad_lines = []
+        with self._open_csv() as source:
+            table = pa_csv.read_csv(source, **self._csv_options(bad_lines))
+        self._reject_lines(bad_lines)
+        return table.to_pandas()
+
+    def _read_chunks(self, chunksize):
+        bad_lines = []
+        with self._open_csv() as source, pa_csv.open_csv(
+            source, **self._csv_options(bad_lines)
+        ) as reader:
+            pending, rows = [], 0
+            for batch in reader:
+                pending.append(batch)
+                rows += batch.num_rows
+                while rows >= chunksize:
+                    table = pa.Table.from_batches(pending)
+                    self._reject_lines(bad_lines)
+                    yield table.slice(0, chunksize).to_pandas()
+                    rest = table.slice(chunksize)
+                    pending, rows = rest.to_batches(), rest.num_rows
+            self._reject_lines(bad_lines)
+            if rows:
+                yield pa.Table.from_batches(pending).to_pandas()
+
+    @contextmanager
+    def _open_csv(self):
+        """the path for pyarrow to read, a decompressed stream if need be"""
+        if self.compression is None:
+            yield self.fullpath
+            return
+        with self._open_stream() as stream:
+            yield stream
+
+    def _csv_options(self, bad_lines):
+        """pyarrow csv options collecting rows of the wrong number of
+        fields in bad_lines.
+
+        Every column is read as text, or dictionary encoded when the
+        schema makes it a category, and cast by the schema afterwards,
+        so a bad value costs its cell rather than the file.
+        """
+        _, head = read_head(self.fullpath, self.head_size)
+        column_types = {
+            name: (
+                pa.dictionary(pa.int32(), pa.string())
+                if (self.schema or {}).get(name.lower()) == "category"
+                else pa.string()
+            )
+            for name in csv_header(head, self.delimiter)
+        }
+
+        def skip_row(row):
+            bad_lines.append((row.text, row.expected_columns,
+                              row.actual_columns))
+            return "skip"
+
+        return {
+            "parse_options": pa_csv.ParseOptions(
+                delimiter=self.delimiter, invalid_row_handler=skip_row
+            ),
+            "convert_options": pa_csv.ConvertOptions(
+                column_types=column_types, strings_can_be_null=True
+            ),
+        }
+
+    def _reject_lines(self, bad_lines):
+        """quarantine the rows collected by _csv_options so far"""
+        if not bad_lines:
+            return
+        lines, expected, found = zip(*bad_lines)
+        bad_lines.clear()
+        self._reject(pd.DataFrame({
+            "line": lines,
+            "reason": [
+                f"expected {want} fields, found {got}"
+                for want, got in zip(expected, found)
+            ],
+        }))
 
     def _parse_records(self, raw):
         return raw
 
     def _postprocess_df(self, df):
-        df = super()._postprocess_df(df)
         df.columns = df.columns.str.lower()
+        df = super()._postprocess_df(df)
         return df
 
 
 class JSONLoader(BaseLoader):
 
-    def __init__(self, fullpath):
+    extensions = JSON_EXTENSIONS
+    schema = PERFORMANCE_SCHEMA
+    natural_key = PERFORMANCE_KEY
+    required = PERFORMANCE_REQUIRED
+    block_size = 1 << 20  # bytes decoded per read
+
+    def __init__(self, fullpath, batch_size=DEFAULT_CHUNKSIZE):
         super().__init__(fullpath)
+        self.batch_size = batch_size
         self.filename = os.path.basename(self.fullpath)
-        self.pattern = r"^PERFORMANCE_[a-zA-Z0-9_]+_\d{8}.json"
 
-    def _validate_file(self):
-        super()._validate_file()
-
-        try:
-            if not self.filename.endswith(".json"):
-                raise ValueError("Invalid file extension. Check file")
-            elif re.match(self.pattern, self.filename, re.IGNORECASE) is None:
-                logger.warning("Invalid JSON filename pattern. Check file")
-            else:
-                logger.info(f"File {self.filename} passed validation check.")
-        except Exception as error:
-            logger.warning(f"File {self.filename} encountered: {error}.")
+    def _check_head(self, head):
+        check_performance_head(self.filename, head)
 
     def _read_source(self):
-        with open(self.fullpath, "r") as f:
-            return f.read()
+        # batches are only read once _parse_records iterates them
+        return self._read_chunks(self.batch_size)
+
+    def _read_chunks(self, chunksize):
+        if self.plain_name.lower().endswith((".ndjson", ".jsonl")):
+            with pd.read_json(
+                self.fullpath,
+                compression=self.compression,
+                lines=True,
+                chunksize=chunksize,
+                dtype=False,
+                convert_dates=False,
+            ) as reader:
+                yield from reader
+            return
+
+        batch = []
+        for record in self._iter_records():
+            batch.append(record)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+    def _iter_records(self):
+        """yield records from a top-level array or a stream of objects.
+
+        The mapped (or decompressed) file is decoded a block at a time and
+        each value is handed to JSONDecoder.raw_decode, so only the
+        current block and the record being decoded are held as text.
+        """
+        decoder = json.JSONDecoder()
+        blocks = self._read_blocks(self.block_size)
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+
+        def read_block():
+            # a block can end inside a character and decode to nothing
+            for block in blocks:
+                text = utf8.decode(block)
+                if text:
+                    return text
+            return utf8.decode(b"", final=True)
+
+        buffer = read_block()
+        pos = 0
+        eof = not buffer
+        in_array = None
+
+        while True:
+            pos = _skip_whitespace(buffer, pos)
+            if pos == len(buffer) and not eof:
+                block = read_block()
+                buffer, pos = block, 0
+                eof = not block
+                continue
+
+            char = buffer[pos:pos + 1]
+            if in_array is None:
+                in_array = char == "["
+                if in_array:
+                    pos += 1
+                continue
+            if in_array and char == "]":
+                return
+            if in_array and char == ",":
+                pos += 1
+                continue
+            if not char:
+                if in_array:
+                    raise json.JSONDecodeError(
+                        "Unterminated array", buffer, pos
+                    )
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # a value touching the end of the block may be cut off
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if not complete:
+                block = read_block()
+                buffer, pos = buffer[pos:] + block, 0
+                eof = not block
+                continue
+
+            pos = end
+            if isinstance(value, list):
+                yield from value
+            else:
+                yield value
 
     def _parse_records(self, raw):
         try:
-            obj = json.loads(raw)
+            if isinstance(raw, str):
+                return json.loads(raw)
+            if isinstance(raw, pd.DataFrame):
+                return raw
+            return list(raw)
         except json.JSONDecodeError as error:
             logger.error(
                 f"Failed to parse JSON for {self.filename}: {error}."
                 f" Skipping file."
             )
             return None
-        return obj
 
     def _postprocess_df(self, df):
         df = super()._postprocess_df(df)
@@ -155,50 +593,89 @@ class JSONLoader(BaseLoader):
 
 class TextLoader(BaseLoader):
 
-    required_columns = 4
+    required_columns = CLICKSTREAMS_FIELDS
+    block_size = 1 << 20  # bytes scanned per search for line ends
+    schema = CLICKSTREAMS_SCHEMA
+    natural_key = CLICKSTREAMS_KEY
+    required = CLICKSTREAMS_REQUIRED
+    date_format = "%m/%d/%Y"
 
     def __init__(self, fullpath):
         super().__init__(fullpath)
         self.filename = os.path.basename(self.fullpath)
-        self.pattern = r"^CLICKSTREAMS_[a-zA-Z0-9_]+_\d{8}.txt"
+        self.format_checked = False  # a chunk of the file has parsed
 
-    def _validate_file(self):
-        super()._validate_file()
-
-        try:
-            if not self.filename.endswith(".txt"):
-                raise ValueError("Invalid file extension. Check file")
-            elif re.match(self.pattern, self.filename, re.IGNORECASE) is None:
-                logger.warning("Invalid Text filename pattern. Check file")
-            else:
-                logger.info(f"File {self.filename} passed validation check.")
-        except Exception as error:
-            logger.warning(f"File {self.filename} encountered: {error}.")
+    def _check_head(self, head):
+        check_clickstreams_head(self.filename, head)
 
     def _read_source(self):
-        return super()._read_source()
+        return self._map_source()
+
+    def _read_chunks(self, chunksize):
+        if self.compression is not None:
+            with self._open_stream() as stream:
+                yield from _stream_lines(stream, chunksize, self.block_size)
+            return
+        yield from _line_slices(
+            self._map_source(), chunksize, self.block_size
+        )
 
     def _parse_records(self, raw):
+        """parse `key: value | key: value` lines into columns.
+
+        The buffer is split on "|" by pyarrow's multithreaded CSV reader
+        and each field is cut into key and value with vectorized string
+        kernels, so no Python code runs per line. Lines with the wrong
+        number of fields are quarantined. Only when no line of the
+        file's first chunk has the right number is the file taken not
+        to be in this format at all, so later chunks never undo the
+        earlier ones.
+        """
         try:
-            parsed_log_data = []
-
-            for line in raw.splitlines():
-                cleaned_line = line.strip()  # remove whitespace
-
-                parts = cleaned_line.split(" | ")
-                curr_log_entry = {}
-
-                for part in parts:
-                    if ": " in part:
-                        key, value = part.split(": ", 1)
-                        curr_log_entry[key.strip().lower()] = value.strip()
-                    if len(parts) != self.required_columns:
-                        raise ValueError(
-                            f"Invalid text format in {self.filename}: {line}"
-                        )
+            if isinstance(raw, str):
+                raw = raw.encode("utf-8")
+            if len(raw) == 0:
+                return pd.DataFrame()
 
-                    parsed_log_data.append(curr_log_entry)
-            return parsed_log_data
+            column_types = _string_columns(self.required_columns)
+            bad_lines = []
+
+            def skip_line(row):
+                bad_lines.append((row.text, row.actual_columns))
+                return "skip"
+
+            table = pa_csv.read_csv(
+                pa.BufferReader(pa.py_buffer(raw)),
+                read_options=pa_csv.ReadOptions(
+                    column_names=list(column_types)
+                ),
+                parse_options=pa_csv.ParseOptions(
+                    delimiter="|",
+                    quote_char=False,
+                    invalid_row_handler=skip_line,
+                ),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=column_types
+                ),
+            )
+            if bad_lines and not table.num_rows and not self.format_checked:
+                raise ValueError(
+                    f"Invalid text format in {self.filename}: expected"
+                    f" {self.required_columns} fields per line,"
+                    f" found {bad_lines[0][1]}"
+                )
+            self.format_checked = True
+            if bad_lines:
+                lines, counts = zip(*bad_lines)
+                self._reject(pd.DataFrame({
+                    "line": lines,
+                    "reason": [
+                        f"expected {self.required_columns} fields,"
+                        f" found {count}"
+                        for count in counts
+                    ],
+                }))
+            return self._split_fields(table)
         except Exception as error:
             logger.error(
                 f"Failed to parse text for {self.filename}: {error}."
@@ -206,8 +683,41 @@ class TextLoader(BaseLoader):
             )
             return None
 
+    def _split_fields(self, table):
+        """turn `key: value` fields into columns named by their keys"""
+        columns = {}
+
+        for field in table.columns:
+            first = field[0].as_py() if len(field) else ""
+            key, sep, _ = first.partition(": ")
+            prefix = key + sep
+            if not sep or not pc.all(pc.starts_with(field, prefix)).as_py():
+                # keys are not in the same position on every line
+                return self._pivot_fields(table.columns)
+            value = pc.utf8_slice_codeunits(field, len(prefix))
+            columns[key.strip().lower()] = pc.utf8_trim_whitespace(value)
+
+        return pa.table(columns).to_pandas()
+
+    def _pivot_fields(self, fields):
+        """slow path for lines whose keys come in differing order"""
+        frames = []
+        for field in fields:
+            pairs = pc.extract_regex(field.combine_chunks(), KEY_VALUE_REGEX)
+            keys = pc.utf8_lower(pc.struct_field(pairs, "key"))
+            values = pc.utf8_trim_whitespace(pc.struct_field(pairs, "value"))
+            frames.append(pd.DataFrame({
+                "row": np.arange(len(field)),
+                "key": keys.to_pandas(),
+                "value": values.to_pandas(),
+            }))
+
+        long_df = pd.concat(frames, ignore_index=True).dropna(subset=["key"])
+        long_df = long_df.drop_duplicates(["row", "key"], keep="last")
+        df = long_df.pivot(index="row", columns="key", values="value")
+        df.columns.name = None
+        return df.reset_index(drop=True)
+
     def _postprocess_df(self, df):
         df = super()._postprocess_df(df)
-        if "date" in df.columns:
-            df.loc[:, "date"] = pd.to_datetime(df["date"], format="%m/%d/%Y")
         return df
@@ -0,0 +1,219 @@
+# metrics.py
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = "etl_stage"
+PROMETHEUS_FIELDS = {
+    "seconds": "Wall time spent in the stage",
+    "rows": "Rows produced or written by the stage",
+    "bytes": "Bytes read by the stage",
+    "peak_rss_bytes": "Peak resident memory during the stage",
+}
+
+
+def _peak_rss():
+    """the process's resident memory high-water mark in bytes"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _reset_peak_rss():
+    """start a new high-water mark, where Linux allows it"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# the high-water mark is process wide, so it is only reset while no
+# other thread has a stage open; thread id -> its open stages
+_open_stages = {}
+_open_stages_lock = threading.Lock()
+
+
+def _open_stage():
+    """count a stage opened by this thread, resetting the peak if alone"""
+    me = threading.get_ident()
+    with _open_stages_lock:
+        if not any(ident != me for ident in _open_stages):
+            _reset_peak_rss()
+        _open_stages[me] = _open_stages.get(me, 0) + 1
+
+
+def _close_stage():
+    me = threading.get_ident()
+    with _open_stages_lock:
+        _open_stages[me] -= 1
+        if not _open_stages[me]:
+            del _open_stages[me]
+
+
+class MetricsRecorder:
+    """Per-stage wall time, rows, bytes and peak memory for one run.
+
+    Each finished stage is appended to a JSON lines file as one record,
+    so records from parser processes land in the same file. A stage's
+    peak memory covers the stages nested inside it. Linux keeps one
+    high-water mark per process, so it is reset only when a stage opens
+    while no other thread has one open. Stages running at once in
+    different threads (parse and write in the ingest pipeline) share it,
+    so their peaks include what the other threads held at the time.
+    Where it cannot be reset (outside Linux) a stage reports the
+    process peak so far.
+    """
+
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._local = threading.local()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def __getstate__(self):
+        # worker processes start with no open stages
+        return {"path": self.path, "run_id": self.run_id}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        """open stages of the calling thread, innermost last"""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """time the body as stage `name`.
+
+        Yields the record, so the body can fill in rows and bytes.
+        """
+        if self._stack:
+            parent = self._stack[-1]
+            parent["peak_rss_bytes"] = max(
+                parent["peak_rss_bytes"], _peak_rss()
+            )
+        _open_stage()
+
+        record = {
+            "run_id": self.run_id,
+            "stage": name,
+            **labels,
+            "rows": None,
+            "bytes": None,
+            "peak_rss_bytes": 0,
+            "pid": os.getpid(),
+        }
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["peak_rss_bytes"] = max(
+                record["peak_rss_bytes"], _peak_rss()
+            )
+            record["timestamp"] = datetime.now().isoformat()
+            _close_stage()
+            self._stack.pop()
+            if self._stack:
+                parent = self._stack[-1]
+                parent["peak_rss_bytes"] = max(
+                    parent["peak_rss_bytes"], record["peak_rss_bytes"]
+                )
+            self._write(record)
+
+    def _write(self, record):
+        if not self.path:
+            return
+        try:
+            # one short O_APPEND write per line keeps processes from
+            # interleaving records
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as error:
+            logger.warning(f"Could not write metrics: {error}")
+
+    def records(self):
+        """this run's records, read back from the JSON lines file"""
+        records = []
+        if not self.path or not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("run_id") == self.run_id:
+                    records.append(record)
+        return records
+
+    def write_prometheus(self, path):
+        """write this run as a Prometheus node_exporter textfile.
+
+        Stages are summed per stage and file, except peak memory which
+        keeps the maximum.
+        """
+        totals = {}
+        for record in self.records():
+            key = (record["stage"], record.get("file") or "")
+            total = totals.setdefault(key, dict.fromkeys(PROMETHEUS_FIELDS))
+            for field in PROMETHEUS_FIELDS:
+                value = record.get(field)
+                if value is None:
+                    continue
+                if field == "peak_rss_bytes":
+                    total[field] = max(total[field] or 0, value)
+                else:
+                    total[field] = (total[field] or 0) + value
+
+        lines = []
+        for field, description in PROMETHEUS_FIELDS.items():
+            metric = f"{PROMETHEUS_PREFIX}_{field}"
+            lines += [
+                f"# HELP {metric} {description}.",
+                f"# TYPE {metric} gauge",
+            ]
+            for (stage, file), total in sorted(totals.items()):
+                if total[field] is None:
+                    continue
+                labels = (
+                    f'run_id="{self.run_id}",stage="{stage}"'
+                    f',file="{_escape(file)}"'
+                )
+                lines.append(f"{metric}{{{labels}}} {total[field]}")
+
+        # node_exporter may read the file at any time, so swap it in whole
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
@@ -0,0 +1,353 @@
+# pipeline.py
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from .etl import CSVLoader, JSONLoader, TextLoader
+from .schemas import align_categories, concat_frames
+from .sources import source_table
+
+logger = logging.getLogger(__name__)
+
+MERGE_KEYS = ["client", "date", "channel"]
+CHUNKED_LOADERS = (CSVLoader, JSONLoader, TextLoader)  # stream in chunks
+
+TABLE_NAMES = {
+    CSVLoader: "ads_data",
+    JSONLoader: "performance_data",
+    TextLoader: "clickstreams_data",
+}
+
+
+LOADERS = {
+    table_name: loader_cls for loader_cls, table_name in TABLE_NAMES.items()
+}
+
+
+def loader_class(filename):
+    """the loader class for a filename, None if the format is unsupported.
+
+    Compressed files go to the loader of the format inside them.
+    """
+    return LOADERS.get(source_table(filename))
+
+
+def parse_file(
+    fullpath,
+    cache=None,
+    metrics=None,
+    validated=False,
+    profiler=None,
+    validator=None,
+):
+    """load one file into a dataframe, runs inside worker processes"""
+    loader_cls = loader_class(os.path.basename(fullpath))
+    if loader_cls is None:
+        raise ValueError(f"Unsupported file format: {fullpath}")
+    loader = loader_cls(fullpath)
+    loader.cache = cache
+    loader.metrics = metrics
+    loader.validated = validated
+    loader.profiler = profiler
+    loader.validator = validator
+    return fullpath, TABLE_NAMES[loader_cls], loader.load()
+
+
+class Failed:
+    """the error of a failed file, sent in place of its closing None"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def background(iterable, maxsize):
+    """iterate over iterable in a thread, running up to maxsize items ahead.
+
+    Errors raised by iterable are re-raised to the consumer. Closing the
+    returned generator stops the thread after its current item.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as error:
+            put(Failed(error))
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Failed):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _warm(fullpath):
+    """ask the kernel to start reading fullpath into the page cache"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(fullpath, os.O_RDONLY)
+    except OSError:
+        return  # the parser reports missing files
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def prefetch(paths, ahead):
+    """yield paths while reads of the next `ahead` files are under way"""
+    def warmed():
+        for fullpath in paths:
+            _warm(fullpath)
+            yield fullpath
+
+    return background(warmed(), ahead)
+
+
+def _file_batches(
+    fullpath,
+    chunksize=0,
+    cache=None,
+    metrics=None,
+    validated=False,
+    profiler=None,
+    validator=None,
+):
+    """one file's batches as iter_batches yields them, errors are raised"""
+    loader_cls = loader_class(os.path.basename(fullpath))
+    if loader_cls is None:
+        raise ValueError(f"Unsupported file format: {fullpath}")
+    table_name = TABLE_NAMES[loader_cls]
+
+    if loader_cls in CHUNKED_LOADERS and chunksize > 0:
+        loader = loader_cls(fullpath)
+        loader.cache = cache
+        loader.metrics = metrics
+        loader.validated = validated
+        loader.profiler = profiler
+        loader.validator = validator
+        for chunk in loader.iter_chunks(chunksize):
+            yield fullpath, table_name, chunk
+    else:
+        yield parse_file(
+            fullpath, cache, metrics, validated, profiler, validator
+        )
+    yield fullpath, table_name, None
+
+
+def iter_batches(
+    paths,
+    chunksize=0,
+    cache=None,
+    metrics=None,
+    validated=False,
+    profiler=None,
+    validator=None,
+):
+    """parse files in order and yield (fullpath, table_name, df) batches.
+
+    Files come in chunks of chunksize rows when chunksize is positive
+    and their loader streams, otherwise whole. After a file's last batch
+    comes (fullpath, table_name, None), so the consumer knows the file
+    is complete. A file that fails is logged and closed by a Failed
+    batch instead, after any chunks it got through.
+    validated skips the loaders' checks for files from an ingestion plan.
+    """
+    for fullpath in paths:
+        try:
+            yield from _file_batches(
+                fullpath, chunksize, cache, metrics, validated, profiler,
+                validator,
+            )
+        except Exception as error:
+            logger.error(
+                f"Failed to load {os.path.basename(fullpath)}:{error}"
+            )
+            yield fullpath, None, Failed(error)
+
+
+def _pool_context():
+    # pyarrow keeps thread pools alive, so forking the parent is unsafe
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+# the chunk queue of the ParserPool a worker process belongs to
+_batches = None
+
+
+def _set_batches(batches):
+    global _batches
+    _batches = batches
+
+
+class ParserPool(ProcessPoolExecutor):
+    """A process pool whose workers send parsed batches back on a queue.
+
+    The queue holds at most queue_size batches; workers wait on it
+    while the consumer is behind, so parsing never runs further ahead
+    than that. It is handed to each worker as the process starts.
+    """
+
+    def __init__(self, workers, queue_size=8):
+        context = _pool_context()
+        self.batches = context.Queue(max(queue_size, 1))
+        super().__init__(
+            workers,
+            mp_context=context,
+            initializer=_set_batches,
+            initargs=(self.batches,),
+        )
+
+
+def parser_pool(workers, queue_size=8):
+    """a ParserPool for parse_files that can be reused across calls"""
+    return ParserPool(workers, queue_size)
+
+
+def stream_file(fullpath, *args):
+    """put one file's batches on the pool's queue, runs in a worker.
+
+    A file that fails ends with a Failed batch instead of its closing
+    one, so the consumer still learns the file is over.
+    """
+    table_name = None
+    try:
+        for fullpath, table_name, df in _file_batches(fullpath, *args):
+            _batches.put((fullpath, table_name, df))
+    except Exception as error:
+        _batches.put((fullpath, table_name, Failed(str(error))))
+
+
+def parse_files(
+    paths,
+    workers=1,
+    queue_size=8,
+    chunksize=0,
+    cache=None,
+    metrics=None,
+    validated=False,
+    pool=None,
+    profiler=None,
+    validator=None,
+):
+    """parse files in parallel and yield batches as iter_batches does.
+
+    Each worker parses one file at a time and streams its batches back,
+    in chunks of chunksize rows as in iter_batches, so batches of
+    different files interleave and files finish in completion order. At
+    most workers batches are being parsed and queue_size waiting to be
+    consumed, so a slow consumer (the database writer) holds back
+    parsing instead of letting parsed frames pile up in memory. Without
+    a pool from parser_pool, one is started for this call.
+    """
+    paths = iter(paths)
+    args = (chunksize, cache, metrics, validated, profiler, validator)
+
+    with nullcontext(pool) if pool else parser_pool(
+        workers, queue_size
+    ) as pool:
+        pending = {}  # fullpath -> its future, until its last batch
+        try:
+            while True:
+                while len(pending) < workers:
+                    fullpath = next(paths, None)
+                    if fullpath is None:
+                        break
+                    pending[fullpath] = pool.submit(
+                        stream_file, fullpath, *args
+                    )
+                if not pending:
+                    return
+
+                batch = _next_batch(pool, pending)
+                if batch is None:
+                    continue
+                fullpath, table_name, df = batch
+                if isinstance(df, Failed):
+                    logger.error(
+                        f"Failed to load {os.path.basename(fullpath)}"
+                        f":{df.error}"
+                    )
+                yield batch
+        finally:
+            # a worker waiting on a full queue would never exit
+            for future in pending.values():
+                future.cancel()
+            while pending:
+                _next_batch(pool, pending)
+
+
+def _next_batch(pool, pending):
+    """the next batch from pool's workers, None if none came in time.
+
+    A file's last batch takes it off pending. A file whose worker died
+    sends nothing more, so it is taken off with a Failed batch made here.
+    """
+    try:
+        batch = pool.batches.get(timeout=0.1)
+    except queue.Empty:
+        for fullpath, future in list(pending.items()):
+            if future.cancelled():
+                pending.pop(fullpath)
+            elif future.done() and future.exception() is not None:
+                pending.pop(fullpath)
+                return fullpath, None, Failed(future.exception())
+        return None
+    fullpath, _, df = batch
+    if df is None or isinstance(df, Failed):
+        pending.pop(fullpath, None)
+    return batch
+
+
+def merge_frames(csv_frames, json_frames, text_frames):
+    """join ads, performance and clickstream frames in memory"""
+    csv_df = concat_frames(csv_frames)
+    json_df = concat_frames(json_frames)
+    text_df = concat_frames(text_frames)
+
+    # loaders parse dates, this only catches frames from other sources
+    for df in (csv_df, json_df, text_df):
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"], format="mixed")
+    align_categories([csv_df, json_df, text_df], MERGE_KEYS)
+
+    if not csv_df.empty and not json_df.empty:
+        merged_df = csv_df.merge(json_df, on=MERGE_KEYS, how="left")
+    else:
+        merged_df = csv_df
+
+    if not merged_df.empty and not text_df.empty:
+        return merged_df.merge(text_df, on=MERGE_KEYS, how="left")
+    return merged_df
@@ -0,0 +1,47 @@
+# plan.py
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .sources import check_source, source_table
+
+logger = logging.getLogger(__name__)
+
+PlannedFile = namedtuple("PlannedFile", ["fullpath", "table_name", "size"])
+
+
+def scan_file(fullpath):
+    """check one file before ingestion, None when it cannot be loaded"""
+    filename = os.path.basename(fullpath)
+    table_name = source_table(filename)
+    if table_name is None:
+        logger.warning(f"Unsupported file format: {filename}")
+        return None
+    try:
+        size = check_source(fullpath, table_name)
+    except Exception as error:
+        logger.error(f"Rejected {filename}: {error}")
+        return None
+    return PlannedFile(fullpath, table_name, size)
+
+
+def plan_ingestion(paths, workers=1):
+    """scan paths in parallel and return the files to load, largest first.
+
+    Every file is opened once, for its name, size and header checks, so
+    bad files are all reported before any loading starts. Loaders given
+    a planned file skip their own validation. Starting with the largest
+    files keeps one big file from being left to run alone at the end.
+    Only the standard library is imported, so validating starts fast.
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        scanned = list(pool.map(scan_file, paths))
+
+    plan = [entry for entry in scanned if entry is not None]
+    plan.sort(key=lambda entry: entry.size, reverse=True)
+    logger.info(
+        f"Planned {len(plan)} of {len(paths)} files,"
+        f" {sum(entry.size for entry in plan) / 2**20:.1f} MB"
+    )
+    return plan
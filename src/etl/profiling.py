@@ -0,0 +1,146 @@
+# profiling.py
+import cProfile
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TOP_ENTRIES = 25  # functions and allocation sites listed per profile
+
+# tracemalloc is process wide, so it runs while any session is open
+_tracing_lock = threading.Lock()
+_tracing_sessions = 0
+
+
+def _start_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        if _tracing_sessions == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_sessions += 1
+
+
+def _stop_tracing():
+    global _tracing_sessions
+    with _tracing_lock:
+        _tracing_sessions -= 1
+        if _tracing_sessions == 0:
+            tracemalloc.stop()
+
+
+class Profiler:
+    """Writes a cProfile and the top allocation sites per file.
+
+    Each session covers one kind of work (load, write) on one file and
+    leaves two files in directory: <name>.prof for pstats or snakeviz,
+    and <name>.txt with the slowest functions and the lines that
+    allocated the most memory. Allocations are traced process wide, so
+    files handled at the same time in one process share their sites.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def session(self, kind, fullpath):
+        """a ProfileSession to enter around each piece of the file's work"""
+        return ProfileSession(self.directory, kind, fullpath)
+
+    @contextmanager
+    def profile(self, kind, fullpath):
+        """profile the body as one session and save it"""
+        session = self.session(kind, fullpath)
+        try:
+            with session:
+                yield
+        finally:
+            session.save()
+
+
+class ProfileSession:
+    """A profile that can be resumed, for work done in pieces.
+
+    Entering profiles the calling thread until exit, and time outside
+    the session (a consumer between chunks, say) is left out. save()
+    writes the result once the file is done.
+    """
+
+    def __init__(self, directory, kind, fullpath):
+        self.directory = directory
+        self.kind = kind
+        self.filename = os.path.basename(fullpath)
+        self.seconds = 0.0
+        self._profile = cProfile.Profile()
+        self._snapshot = None
+        self._started = None
+        self._enabled = False
+        self._profiled = False  # whether any piece got the profiler
+
+    def __enter__(self):
+        if self._snapshot is None:
+            _start_tracing()
+            tracemalloc.reset_peak()
+            self._snapshot = tracemalloc.take_snapshot()
+        self._started = time.perf_counter()
+        try:
+            self._profile.enable()
+            self._enabled = self._profiled = True
+        except ValueError:
+            # Python 3.12+ runs one profiler per process; the other
+            # session keeps it and this piece is only timed and traced
+            self._enabled = False
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._enabled:
+            self._profile.disable()
+        self.seconds += time.perf_counter() - self._started
+
+    def save(self):
+        """write the .prof and .txt files, returns the .txt path"""
+        if self._snapshot is None:
+            return None
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            _stop_tracing()
+        # leave out the start snapshot, which is traced itself
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        sites = snapshot.filter_traces(ignore).compare_to(
+            self._snapshot.filter_traces(ignore), "lineno"
+        )
+        self._snapshot = None
+
+        name = (
+            f"profile-{self.kind}-{self.filename}"
+            f"-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+        )
+        path = os.path.join(self.directory, name)
+        try:
+            if self._profiled:
+                self._profile.dump_stats(f"{path}.prof")
+            with open(f"{path}.txt", "w", encoding="utf-8") as f:
+                f.write(
+                    f"{self.kind} {self.filename}: {self.seconds:.3f} s"
+                    f" profiled, {peak / 2**20:.1f} MB peak traced\n\n"
+                )
+                if self._profiled:
+                    stats = pstats.Stats(self._profile, stream=f)
+                    stats.sort_stats("cumulative").print_stats(TOP_ENTRIES)
+                else:
+                    f.write("No calls profiled\n\n")
+                f.write("Top allocation sites (net change)\n")
+                for site in sites[:TOP_ENTRIES]:
+                    f.write(f"{site}\n")
+        except OSError as error:
+            logger.warning(f"Could not write profile {name}: {error}")
+            return None
+        logger.info(f"Wrote profile {name}")
+        return f"{path}.txt"
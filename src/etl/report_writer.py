@@ -0,0 +1,127 @@
+# report_writer.py
+import datetime
+import decimal
+import gzip
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = ("csv", "csv.gz", "parquet")
+SIDECAR_SUFFIX = ".meta.json"
+# Python type of a source column -> name of its pyarrow type factory
+ARROW_TYPES = {
+    bool: "bool_",
+    int: "int64",
+    float: "float64",
+    decimal.Decimal: "float64",  # read_sql hands NUMERIC over as floats
+    str: "string",
+    datetime.date: "date32",
+    datetime.datetime: "timestamp",
+}
+
+
+def report_format(path):
+    """the format a report path's extension asks for"""
+    for name in sorted(REPORT_FORMATS, key=len, reverse=True):
+        if path.endswith(f".{name}"):
+            return name
+    raise ValueError(f"Unknown report format: {path}")
+
+
+class ReportWriter:
+    """Writes a report to disk one chunk at a time.
+
+    The format follows the path's extension: .csv, .csv.gz or
+    .parquet. Each chunk is written as it comes and nothing is kept, so
+    memory stays at one chunk however long the report runs. Parquet
+    files get a row group per chunk. Their column types come from
+    column_types, which maps columns to the Python type of their source
+    column, so a chunk whose values are all NULL cannot set the type;
+    other columns are typed like the first chunk, as text when it holds
+    only NULLs.
+    """
+
+    def __init__(self, path, column_types=None):
+        self.path = path
+        self.format = report_format(path)
+        self.column_types = dict(column_types or {})
+        self.columns = None
+        self.row_count = 0
+        self._file = None
+        self._schema = None
+
+    def write(self, chunk):
+        if self.columns is None:
+            self.columns = [str(column) for column in chunk.columns]
+            self._open(chunk)
+        if self.format == "parquet":
+            self._write_parquet(chunk)
+        else:
+            chunk.to_csv(self._file, header=self.row_count == 0, index=False)
+        self.row_count += len(chunk)
+
+    def _open(self, chunk):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            for i, field in enumerate(schema):
+                declared = _arrow_type(self.column_types.get(field.name))
+                if declared is not None:
+                    schema = schema.set(i, field.with_type(declared))
+                elif pa.types.is_null(field.type):
+                    schema = schema.set(i, field.with_type(pa.string()))
+            self._schema = schema
+            self._file = pq.ParquetWriter(self.path, schema)
+        elif self.format == "csv.gz":
+            # level 6 is several times faster than gzip's default 9
+            self._file = gzip.open(
+                self.path, "wt", compresslevel=6, newline=""
+            )
+        else:
+            self._file = open(self.path, "w", newline="")
+
+    def _write_parquet(self, chunk):
+        import pyarrow as pa
+
+        self._file.write_table(pa.Table.from_pandas(
+            chunk, schema=self._schema, preserve_index=False
+        ))
+
+    def close(self):
+        """finish the file; a report with no chunks is left empty"""
+        if self._file is None:
+            open(self.path, "w").close()
+            self.columns = []
+            return
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _arrow_type(python_type):
+    """the pyarrow type for a column of python_type, None if unknown"""
+    name = ARROW_TYPES.get(python_type)
+    if name is None:
+        return None
+    import pyarrow as pa
+
+    if name == "timestamp":
+        return pa.timestamp("us")
+    return getattr(pa, name)()
+
+
+def write_sidecar(path, metadata):
+    """write a report's run metadata next to it as <path>.meta.json"""
+    sidecar = f"{path}{SIDECAR_SUFFIX}"
+    with open(sidecar, "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    logger.info(f"Wrote report metadata to {sidecar}")
+    return sidecar
@@ -0,0 +1,100 @@
+# schemas.py
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Column types per source. Low-cardinality keys are categoricals, dates
+# are parsed, counts are 32-bit. Money stays float64 so summed spend in
+# reports does not drift.
+ADS_SCHEMA = {
+    "client": "category",
+    "date": "datetime",
+    "channel": "category",
+    "campaign_id": "category",
+    "spend_usd": "float64",
+}
+
+PERFORMANCE_SCHEMA = {
+    "client": "category",
+    "date": "datetime",
+    "channel": "category",
+    "impressions": "int32",
+    "clicks": "int32",
+    "conversions": "int32",
+    "cost_per_click": "float64",
+}
+
+CLICKSTREAMS_SCHEMA = {
+    "client": "category",
+    "date": "datetime",
+    "channel": "category",
+    "event": "category",
+}
+
+# Natural keys: the columns that identify a row, so a row re-delivered in
+# a later file is recognised as the same row. A clickstream line has no
+# id of its own, so all of its fields form the key.
+ADS_KEY = ("client", "date", "channel", "campaign_id")
+PERFORMANCE_KEY = ("client", "date", "channel")
+CLICKSTREAMS_KEY = ("client", "date", "channel", "event")
+
+# Columns every row must have a value in, see validation.py. Rows missing
+# one are quarantined instead of loaded.
+ADS_REQUIRED = ("client", "date", "channel", "spend_usd")
+PERFORMANCE_REQUIRED = ("client", "date", "channel")
+CLICKSTREAMS_REQUIRED = ("client", "date", "channel", "event")
+# Amounts and counts that cannot be negative
+NON_NEGATIVE = (
+    "spend_usd", "impressions", "clicks", "conversions", "cost_per_click",
+)
+
+
+def apply_schema(df, schema, date_format=None):
+    """cast the columns of df that schema declares, in place.
+
+    Values that do not fit their declared type become missing, so a bad
+    cell costs its value rather than the whole file.
+    """
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if dtype == "datetime":
+            df[column] = pd.to_datetime(
+                df[column], format=date_format, errors="coerce"
+            )
+        elif dtype == "category":
+            df[column] = df[column].astype("category")
+        else:
+            values = pd.to_numeric(df[column], errors="coerce")
+            if dtype.startswith("int") and values.isna().any():
+                dtype = dtype.capitalize()  # nullable Int32
+            df[column] = values.astype(dtype)
+    return df
+
+
+def concat_frames(frames):
+    """concatenate frames without losing categoricals to object dtype"""
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+
+    align_categories(frames, frames[0].columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def align_categories(frames, columns):
+    """give the categorical columns shared by frames the same categories.
+
+    pandas merges categorical keys on their codes when both sides share
+    categories, and falls back to comparing objects when they do not.
+    """
+    for column in columns:
+        series = [df[column] for df in frames if column in df.columns]
+        if not series or not all(
+            isinstance(s.dtype, pd.CategoricalDtype) for s in series
+        ):
+            continue
+        categories = union_categoricals(series).categories
+        for df in frames:
+            if column in df.columns:
+                df[column] = df[column].cat.set_categories(categories)
+    return frames
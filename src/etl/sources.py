@@ -0,0 +1,172 @@
+# sources.py
+"""File names, compression and header checks of each source.
+
+Only the standard library is used here, so checking files (the
+validate command, the ingestion plan) starts without pandas or pyarrow.
+"""
+import bz2
+import csv
+import fnmatch
+import gzip
+import io
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+HEAD_SIZE = 64 << 10  # bytes read to check headers
+# suffix -> compression, named as pandas' compression argument names it
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd"}
+
+ADS_PATTERN = r"^AD_SPEND_[a-zA-Z0-9_]+_\d{8}.csv"
+ADS_COLUMNS = ["Date", "Channel", "Spend_usd", "Client"]
+JSON_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+PERFORMANCE_PATTERN = r"^PERFORMANCE_[a-zA-Z0-9_]+_\d{8}.(nd)?json(l)?"
+CLICKSTREAMS_PATTERN = r"^CLICKSTREAMS_[a-zA-Z0-9_]+_\d{8}.txt"
+CLICKSTREAMS_FIELDS = 4
+
+
+def split_compression(filename):
+    """(filename without its compression suffix, compression or None)"""
+    for suffix, compression in COMPRESSIONS.items():
+        if filename.lower().endswith(suffix):
+            return filename[:-len(suffix)], compression
+    return filename, None
+
+
+def decompress(f, compression):
+    """a reader of f's decompressed bytes, f itself when uncompressed"""
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(f, "rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as error:
+            raise ValueError(
+                "The zstandard package is needed to read .zst files"
+            ) from error
+        return zstandard.ZstdDecompressor().stream_reader(
+            f, read_across_frames=True
+        )
+    return f
+
+
+def read_head(fullpath, head_size=HEAD_SIZE):
+    """(size in bytes, first head_size decompressed bytes) of a file"""
+    compression = split_compression(os.path.basename(fullpath))[1]
+    try:
+        f = open(fullpath, "rb")
+    except FileNotFoundError:
+        logger.error("File doesn't exists. Check folders. ")
+        raise FileNotFoundError(f"File in path {fullpath} not found.")
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        with decompress(f, compression) as stream:
+            head = stream.read(head_size)
+    return size, head
+
+
+def csv_header(head, delimiter=","):
+    """the column names in the first line of a csv file's head"""
+    line = head.decode("utf-8-sig", errors="replace").splitlines()
+    return next(
+        csv.reader(io.StringIO(line[0] if line else ""), delimiter=delimiter),
+        [],
+    )
+
+
+def check_ads_head(filename, head, delimiter=","):
+    """validates an ads file's name and header row"""
+    if not split_compression(filename)[0].endswith(".csv"):
+        raise ValueError("Invalid file extension. Check file.")
+
+    if re.match(ADS_PATTERN, filename, re.IGNORECASE) is None:
+        logger.warning("Invalid CSV filename pattern. Check file.")
+
+    try:
+        # the header row is parsed from the bytes already read
+        col_names = csv_header(head, delimiter)
+
+        if not all(col in col_names for col in ADS_COLUMNS):
+            # the row checks quarantine its rows, when they run
+            logger.warning(
+                f"CSV file {filename}"
+                f" is missing required columns. Skipping file.")
+        else:
+            logger.info(f"File {filename} passed validation check.")
+
+    except Exception as error:
+        logger.warning(f"File {filename}"
+                       f"encountered a header error: {error}."
+                       )
+
+
+def check_performance_head(filename, head):
+    """validates a performance file's name and first JSON value"""
+    try:
+        first = head.lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+        if not split_compression(filename)[0].endswith(JSON_EXTENSIONS):
+            raise ValueError("Invalid file extension. Check file")
+        elif re.match(PERFORMANCE_PATTERN, filename, re.IGNORECASE) is None:
+            logger.warning("Invalid JSON filename pattern. Check file")
+        elif first not in (b"[", b"{", b""):
+            logger.warning(
+                f"File {filename} does not start with a JSON value"
+            )
+        else:
+            logger.info(f"File {filename} passed validation check.")
+    except Exception as error:
+        logger.warning(f"File {filename} encountered: {error}.")
+
+
+def check_clickstreams_head(filename, head):
+    """validates a clickstream file's name and fields per line"""
+    try:
+        first_line = head.split(b"\n", 1)[0].strip()
+        fields = len(first_line.split(b"|")) if first_line else 0
+        if not split_compression(filename)[0].endswith(".txt"):
+            raise ValueError("Invalid file extension. Check file")
+        elif re.match(CLICKSTREAMS_PATTERN, filename, re.IGNORECASE) is None:
+            logger.warning("Invalid Text filename pattern. Check file")
+        elif fields not in (0, CLICKSTREAMS_FIELDS):
+            logger.warning(
+                f"File {filename} has {fields} fields per line,"
+                f" expected {CLICKSTREAMS_FIELDS}"
+            )
+        else:
+            logger.info(f"File {filename} passed validation check.")
+    except Exception as error:
+        logger.warning(f"File {filename} encountered: {error}.")
+
+
+# table -> (file name patterns, header check) of the source loaded into it
+SOURCES = {
+    "ads_data": (("*.csv",), check_ads_head),
+    "performance_data": (
+        tuple(f"*{ext}" for ext in JSON_EXTENSIONS),
+        check_performance_head,
+    ),
+    "clickstreams_data": (("*.txt",), check_clickstreams_head),
+}
+
+
+def source_table(filename):
+    """the table a file loads into, None if its format is unsupported.
+
+    Compressed files go by the format inside them.
+    """
+    filename, _ = split_compression(filename)
+    for table_name, (patterns, _) in SOURCES.items():
+        if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+            return table_name
+    return None
+
+
+def check_source(fullpath, table_name):
+    """check a file with a single open, returns its size in bytes"""
+    size, head = read_head(fullpath)
+    SOURCES[table_name][1](os.path.basename(fullpath), head)
+    return size
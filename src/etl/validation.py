@@ -0,0 +1,89 @@
+# validation.py
+import logging
+import os
+import numpy as np
+import pandas as pd
+from .schemas import NON_NEGATIVE
+
+logger = logging.getLogger(__name__)
+
+
+class RowValidator:
+    """Row checks for parsed frames, and the quarantine for rows failing them.
+
+    A row fails when a required column is missing, empty or does not
+    parse (dates, amounts), when an amount or count is negative, or when
+    its channel is not one of channels; with no channels any channel
+    passes. Failed rows are written as they were read, with a reason
+    column, to <directory>/<source file>.jsonl, and the rest of the file
+    loads as usual.
+    """
+
+    def __init__(self, directory, channels=()):
+        self.directory = directory
+        self.channels = tuple(channels)
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def fingerprint(self):
+        """the settings that decide which rows pass, for cache keys"""
+        return ",".join(sorted(self.channels))
+
+    def check(self, df, raw, required):
+        """(mask of failing rows, their reasons) for df.
+
+        raw maps df's columns to their values as parsed, before schema
+        casts, so a value that did not parse is told from a missing one.
+        Checks run column by column over the whole frame.
+        """
+        checks = []
+        for column in required:
+            if column not in df.columns:
+                checks.append((
+                    f"missing column {column}", np.ones(len(df), dtype=bool)
+                ))
+                continue
+            values = raw.get(column, df[column])
+            missing = _mask(values.isna() | values.eq(""))
+            checks.append((f"missing {column}", missing))
+            checks.append((
+                f"unparseable {column}", _mask(df[column].isna()) & ~missing
+            ))
+        for column in NON_NEGATIVE:
+            if column in df.columns:
+                checks.append((f"negative {column}", _mask(df[column].lt(0))))
+        if self.channels and "channel" in df.columns:
+            channel = df["channel"]
+            checks.append((
+                "unknown channel",
+                _mask(channel.notna() & ~channel.isin(self.channels)),
+            ))
+
+        failed = np.zeros(len(df), dtype=bool)
+        for _, mask in checks:
+            failed |= mask
+        # reasons are only built for the failing rows
+        reasons = np.full(failed.sum(), "", dtype=object)
+        for reason, mask in checks:
+            hit = mask[failed]
+            reasons[hit] = reasons[hit] + f"; {reason}"
+        return failed, pd.Series(reasons, dtype=object).str[2:]
+
+    def quarantine(self, fullpath, rows, append=False):
+        """write rows to fullpath's quarantine file, returns its path"""
+        path = os.path.join(
+            self.directory, f"{os.path.basename(fullpath)}.jsonl"
+        )
+        with open(path, "a" if append else "w", encoding="utf-8") as f:
+            f.write(rows.to_json(
+                orient="records",
+                lines=True,
+                date_format="iso",
+                default_handler=str,
+            ).rstrip("\n") + "\n")
+        return path
+
+
+def _mask(values):
+    """a boolean numpy mask from a comparison, missing values as False"""
+    return np.asarray(values.fillna(False), dtype=bool)
@@ -0,0 +1,178 @@
+# watch.py
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+MAX_WAIT = 1.0  # seconds between checks of the stop event
+
+
+class InotifyWatcher:
+    """Files written or moved into a directory, as the kernel reports them.
+
+    Only finished files are reported: IN_CLOSE_WRITE fires once the
+    writer closes the file, and IN_MOVED_TO when a file is renamed in,
+    which is how most transfer tools publish a completed upload.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        watch = libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+        )
+        if watch < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {directory}")
+
+    def poll(self, timeout):
+        """paths of files that arrived, waiting up to timeout seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, size = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + size].rstrip(b"\0")
+            offset += size
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so offer every file again
+                logger.warning(f"Missed file events in {self.directory}")
+                paths += _list_files(self.directory)
+            elif name:
+                paths.append(os.path.join(self.directory, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Files new or changed in a directory, found by listing it.
+
+    A file is reported once its size and mtime are the same on two
+    listings in a row, so files still being copied are left alone.
+    Files present when the watcher starts are not reported.
+    """
+
+    def __init__(self, directory, interval=2.0):
+        self.directory = directory
+        self.interval = interval
+        self._seen = self._listing()
+        self._changed = {}
+        self._next = time.monotonic() + interval
+
+    def _listing(self):
+        listing = {}
+        for fullpath in _list_files(self.directory):
+            try:
+                stat = os.stat(fullpath)
+            except OSError:
+                continue
+            listing[fullpath] = (stat.st_size, stat.st_mtime_ns)
+        return listing
+
+    def poll(self, timeout):
+        """paths of files that arrived, waiting up to timeout seconds"""
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0))
+        self._next = time.monotonic() + self.interval
+
+        paths = []
+        listing = self._listing()
+        for fullpath, fingerprint in listing.items():
+            if self._seen.get(fullpath) == fingerprint:
+                continue
+            if self._changed.get(fullpath) == fingerprint:
+                paths.append(fullpath)  # settled since the last listing
+                self._seen[fullpath] = fingerprint
+                del self._changed[fullpath]
+            else:
+                self._changed[fullpath] = fingerprint
+        for fullpath in set(self._seen) - set(listing):
+            del self._seen[fullpath]
+        return paths
+
+    def close(self):
+        pass
+
+
+def _list_files(directory):
+    return [
+        entry.path for entry in os.scandir(directory) if entry.is_file()
+    ]
+
+
+def watch_directory(directory, poll_interval=2.0):
+    """an inotify watcher for directory, or a polling one without inotify"""
+    if hasattr(os, "O_CLOEXEC"):
+        try:
+            return InotifyWatcher(directory)
+        except (AttributeError, OSError) as error:
+            logger.warning(f"inotify unavailable, polling instead: {error}")
+    return PollingWatcher(directory, poll_interval)
+
+
+def micro_batches(watcher, max_files, max_bytes, max_seconds, stop):
+    """group arriving files into batches until stop is set.
+
+    A batch is handed over once it holds max_files files or max_bytes
+    bytes, or when its first file has waited max_seconds, so a trickle
+    of files still lands within max_seconds.
+    """
+    batch = []
+    batch_bytes = 0
+    deadline = None
+
+    while not stop.is_set():
+        timeout = MAX_WAIT
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.monotonic(), 0))
+
+        for fullpath in watcher.poll(timeout):
+            if fullpath in batch:
+                continue
+            try:
+                batch_bytes += os.path.getsize(fullpath)
+            except OSError:
+                continue  # gone again before it could be loaded
+            batch.append(fullpath)
+            if deadline is None:
+                deadline = time.monotonic() + max_seconds
+
+        if batch and (
+            len(batch) >= max_files
+            or batch_bytes >= max_bytes
+            or time.monotonic() >= deadline
+        ):
+            yield batch
+            batch, batch_bytes, deadline = [], 0, None
+
+    if batch:
+        yield batch
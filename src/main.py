@@ -1,133 +1,570 @@
 # main.py
-import fnmatch
-import os
-import pandas as pd
+"""Load marketing source files into Postgres and report on them.
+
+    python src/main.py             ingest, report and merge
+    python src/main.py ingest      load new files into the database
+    python src/main.py merge       write the master report
+    python src/main.py report      print totals by channel
+    python src/main.py validate    check the files in data_directory
+
+pandas, pyarrow and SQLAlchemy are imported by the commands that use
+them, so a command only pays for what it runs.
+"""
+import argparse
 import logging
-from datetime import datetime
-from etl.etl import CSVLoader, JSONLoader, TextLoader
+import os
+import signal
+import sys
+import threading
+from contextlib import nullcontext
+from datetime import date, datetime
+from types import SimpleNamespace
 from database.config import get_config, get_db_engine
-from database.database_writer import DatabaseWriter
 
-# Load config object
-config = get_config()
-if not config:
-    print("Failed to load configuration. Exiting.")
-    exit(1)
+logger = logging.getLogger(__name__)
+
+COMMANDS = ("ingest", "merge", "report", "validate")
+FACT_TABLES = ("ads_data", "performance_data", "clickstreams_data")
 
-# Access directories
-data_directory = config.get("Paths", "data_directory")
-log_directory = config.get("Paths", "log_directory")
-processed_directory = config.get("Paths", "processed_directory")
 
-os.makedirs(data_directory, exist_ok=True)
-os.makedirs(log_directory, exist_ok=True)
-os.makedirs(processed_directory, exist_ok=True)
+def timed(metrics, name, **labels):
+    """time a step of main() as a metrics stage, when metrics are on"""
+    if metrics is None:
+        return nullcontext({})
+    return metrics.stage(name, **labels)
 
-# Configure logging
-log_path = os.path.join(log_directory, "etl.log")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_path, encoding="utf-8", mode="a"),
-        logging.StreamHandler(),
-    ],
-)
+def read_settings(config):
+    """the pipeline's settings, read from config"""
+    return SimpleNamespace(
+        # Access directories
+        data_directory=config.get("Paths", "data_directory"),
+        log_directory=config.get("Paths", "log_directory"),
+        processed_directory=config.get("Paths", "processed_directory"),
+        # Rows per chunk when streaming files, 0 reads each file whole
+        chunksize=config.getint("Runtime", "chunksize", fallback=0),
+        # How each file reaches its table: append, upsert, replace, or
+        # reload which swaps out the stored rows of each file's clients on
+        # the days the file holds
+        write_mode=config.get("Runtime", "write_mode", fallback="append"),
+        # Parser processes, 0 uses every core; parsed chunks (or whole
+        # files when chunksize is 0) wait in a queue of queue_size
+        workers=(
+            config.getint("Runtime", "workers", fallback=1) or os.cpu_count()
+        ),
+        queue_size=config.getint("Runtime", "queue_size", fallback=8),
+        # Skip files the ingestion manifest has already seen unchanged
+        incremental=config.getboolean(
+            "Runtime", "incremental", fallback=False
+        ),
+        # Build the master report with a SQL join instead of pandas merges,
+        # always in SQL when a run does not parse every loaded row (see
+        # sql_merge_reason)
+        merge_in_sql=(
+            config.get("Runtime", "merge", fallback="pandas") == "sql"
+        ),
+        # Parsed files are cached as parquet, 0 disables the cache
+        cache_directory=config.get(
+            "Paths", "cache_directory", fallback="./cache"
+        ),
+        cache_max_mb=config.getint("Runtime", "cache_max_mb", fallback=0),
+        # Rows failing the row checks go to quarantine_directory instead
+        # of the database; an empty channels list accepts any channel
+        validate_rows=config.getboolean(
+            "Runtime", "validate_rows", fallback=True
+        ),
+        quarantine_directory=config.get(
+            "Paths", "quarantine_directory", fallback="./quarantine"
+        ),
+        channels=[
+            channel.strip()
+            for channel in config.get(
+                "Runtime", "channels", fallback=""
+            ).split(",")
+            if channel.strip()
+        ],
+        # Drop rows whose natural key was loaded from an earlier file
+        dedupe=config.getboolean("Runtime", "dedupe", fallback=False),
+        # Per-stage timings: off, jsonl, or prometheus (keeps the jsonl)
+        metrics_format=config.get("Runtime", "metrics", fallback="off"),
+        # Keep running and load files as they arrive in data_directory,
+        # in batches of up to watch_batch_files files or watch_batch_mb
+        # MB, or whatever arrived within watch_batch_seconds
+        watch=config.getboolean("Runtime", "watch", fallback=False),
+        watch_batch_files=config.getint(
+            "Runtime", "watch_batch_files", fallback=100
+        ),
+        watch_batch_mb=config.getint(
+            "Runtime", "watch_batch_mb", fallback=256
+        ),
+        watch_batch_seconds=config.getfloat(
+            "Runtime", "watch_batch_seconds", fallback=5
+        ),
+        # Listing interval where inotify is not available
+        watch_poll_seconds=config.getfloat(
+            "Runtime", "watch_poll_seconds", fallback=2
+        ),
+        # Share files with other ingest processes through a claims
+        # table; a claim not renewed for claim_lease_seconds is retried
+        claims=config.getboolean("Runtime", "claims", fallback=False),
+        claim_lease_seconds=config.getint(
+            "Runtime", "claim_lease_seconds", fallback=300
+        ),
+        # New fact tables get a partition per day on Postgres
+        partition=config.getboolean("Runtime", "partition", fallback=False),
+        # cProfile and tracemalloc each file's load and writes, into
+        # log_directory
+        profile=config.getboolean("Runtime", "profile", fallback=False),
+        # Master report format: csv, csv.gz or parquet
+        report_format=config.get("Runtime", "report_format", fallback="csv"),
+        # Limit the SQL master report to dates in [report_from, report_to)
+        report_from=_read_date(config, "report_from"),
+        report_to=_read_date(config, "report_to"),
+    )
 
-# ===============================================
 
-logger = logging.getLogger(__name__)
-logger.info("Application started.")
+def _read_date(config, option):
+    day = config.get("Runtime", option, fallback="")
+    return date.fromisoformat(day) if day else None
+
+
+def setup(settings):
+    """create the working directories and configure logging"""
+    os.makedirs(settings.data_directory, exist_ok=True)
+    os.makedirs(settings.log_directory, exist_ok=True)
+    os.makedirs(settings.processed_directory, exist_ok=True)
+
+    log_path = os.path.join(settings.log_directory, "etl.log")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(log_path, encoding="utf-8", mode="a"),
+            logging.StreamHandler(),
+        ],
+    )
+
+
+def start_metrics(settings):
+    """the run's MetricsRecorder, None when metrics are off"""
+    if settings.metrics_format == "off":
+        return None
+    from etl.metrics import MetricsRecorder
+
+    metrics = MetricsRecorder(
+        os.path.join(settings.log_directory, "metrics.jsonl")
+    )
+    logger.info(f"Recording stage metrics for run {metrics.run_id}")
+    return metrics
+
+
+def start_validator(settings):
+    """the run's RowValidator, None when the row checks are off"""
+    if not settings.validate_rows:
+        return None
+    from etl.validation import RowValidator
+
+    return RowValidator(settings.quarantine_directory, settings.channels)
+
+
+def start_profiler(settings):
+    """the run's Profiler, None unless profiling is on"""
+    if not settings.profile:
+        return None
+    from etl.profiling import Profiler
+
+    logger.info(f"Profiling each file into {settings.log_directory}")
+    return Profiler(settings.log_directory)
 
-merged_df = pd.DataFrame()
-df_master = pd.DataFrame()
 
-csv_frames = []
-json_frames = []
-text_frames = []
+def make_writer(settings, engine, metrics=None):
+    from database.database_writer import DatabaseWriter
+    from etl.pipeline import TABLE_NAMES
 
-engine = None
+    natural_keys = {
+        table_name: loader_cls.natural_key
+        for loader_cls, table_name in TABLE_NAMES.items()
+    }
+    return DatabaseWriter(
+        engine,
+        mode=settings.write_mode,
+        metrics=metrics,
+        natural_keys=natural_keys,
+        partitioned=settings.partition,
+        dedupe=settings.dedupe,
+    )
 
-try:
+
+def list_files(directory):
+    return [
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+    ]
+
+
+def validate(settings):
+    """check every file in data_directory, returns how many were rejected"""
+    from etl.plan import plan_ingestion
+
+    paths = list_files(settings.data_directory)
+    plan = plan_ingestion(paths, settings.workers)
+    for entry in plan:
+        print(
+            f"{entry.table_name:<20} {entry.size:>14,}"
+            f"  {os.path.basename(entry.fullpath)}"
+        )
+    return len(paths) - len(plan)
+
+
+def ingest(settings, engine, metrics=None, frames=None):
+    """load new files in data_directory into the database.
+
+    Parsed frames are also kept in frames[table_name] when frames is
+    given, for a pandas merge. In watch mode this returns once the
+    watch is stopped.
+    """
+    from database.manifest import IngestionManifest
+    from etl.cache import ParsedFileCache
+    from etl.plan import plan_ingestion
+    from etl.pipeline import (
+        Failed,
+        background,
+        iter_batches,
+        parse_files,
+        prefetch,
+    )
+
+    writer = make_writer(settings, engine, metrics)
+    manifest = IngestionManifest(engine) if settings.incremental else None
+    cache = None
+    if settings.cache_max_mb > 0:
+        cache = ParsedFileCache(
+            settings.cache_directory, settings.cache_max_mb * 2**20
+        )
+    workers = settings.workers
+    profiler = start_profiler(settings)
+    validator = start_validator(settings)
+    claims = None
+    if settings.claims:
+        from database.claims import FileClaims
+
+        claims = FileClaims(engine, lease_seconds=settings.claim_lease_seconds)
+
+    # rows written and latest columns per file, rows is None once a
+    # write failed and the rest of the file is skipped
+    written = {}
+    # open write profiles per file, saved once the file is over
+    profiles = {}
+    # (day, client) pairs each file has reloaded so far
+    reloaded = {}
+
+    def write_batch(fullpath, table_name, df):
+        rows, columns = written.get(fullpath, (0, None))
+
+        if df is None or isinstance(df, Failed):  # the file is over
+            written.pop(fullpath, None)
+            reloaded.pop(fullpath, None)
+            if fullpath in profiles:
+                profiles.pop(fullpath).save()
+            if isinstance(df, Failed):
+                if claims is not None:
+                    claims.finish(fullpath, ok=False)
+                return
+            if claims is not None:
+                claims.finish(fullpath, ok=bool(rows))
+            if rows and manifest is not None:
+                manifest.record(fullpath, table_name, rows, columns)
+            elif rows == 0:
+                logger.warning(
+                    f"No data returned for {os.path.basename(fullpath)}"
+                )
+            return
+        if rows is None or df.empty:
+            return
+
+        if frames is not None:
+            frames[table_name].append(df)
+        # a replaced table is extended by the file's later chunks
+        mode = None
+        if rows and settings.write_mode == "replace":
+            mode = "append"
+        logger.info(f"Preparing to insert {len(df)} rows")
+        session = nullcontext()
+        if profiler is not None:
+            if fullpath not in profiles:
+                profiles[fullpath] = profiler.session("write", fullpath)
+            session = profiles[fullpath]
+        with session:
+            loaded = writer.load_to_database(
+                df, table_name, mode=mode,
+                cleared=reloaded.setdefault(fullpath, set()),
+            )
+        if loaded:
+            written[fullpath] = (rows + len(df), df.columns)
+        else:
+            written[fullpath] = (None, columns)
+
+    def ingest_paths(paths, pool=None):
+        # every file is checked up front, then loaded largest first
+        with timed(metrics, "plan") as stage:
+            plan = plan_ingestion(paths, workers)
+            stage["files"] = len(plan)
+            stage["bytes"] = sum(entry.size for entry in plan)
+        paths = [entry.fullpath for entry in plan]
+        if manifest is not None:
+            paths = manifest.pending(paths)
+        if claims is not None:
+            pending = set(paths)
+            claims.register(
+                (entry.fullpath, entry.size)
+                for entry in plan
+                if entry.fullpath in pending
+            )
+
+        # reader -> parser -> writer: upcoming files are read ahead
+        # while the next batch is parsed and the previous one written
+        with timed(metrics, "ingest") as stage, (
+            claims.heartbeat() if claims is not None else nullcontext()
+        ):
+            if claims is None:
+                stage["files"] = len(paths)
+            else:
+                # files go to whichever process has room for the next
+                # one, so this one may load some it did not find
+                paths = claims.claimed()
+            paths = prefetch(paths, settings.queue_size)
+            if workers > 1:
+                batches = parse_files(
+                    paths, workers, settings.queue_size, settings.chunksize,
+                    cache, metrics, validated=True, pool=pool,
+                    profiler=profiler, validator=validator,
+                )
+            else:
+                batches = background(
+                    iter_batches(
+                        paths, settings.chunksize, cache, metrics,
+                        validated=True, profiler=profiler,
+                        validator=validator,
+                    ),
+                    settings.queue_size,
+                )
+            for batch in batches:
+                write_batch(*batch)
+
+    watcher = None
+    if settings.watch:
+        from etl.watch import watch_directory
+
+        # watch before the first scan, so no arrival falls in between
+        watcher = watch_directory(
+            settings.data_directory, settings.watch_poll_seconds
+        )
+    ingest_paths(list_files(settings.data_directory))
+    if watcher is not None:
+        watch_loop(watcher, ingest_paths, settings)
+
+
+def watch_loop(watcher, ingest_paths, settings):
+    """ingest files as they arrive, in micro-batches, until stopped.
+
+    SIGTERM or Ctrl-C lets the batch in progress finish, then returns.
+    The parser processes stay up between batches.
+    """
+    from etl.pipeline import parser_pool
+    from etl.watch import micro_batches
+
+    workers = settings.workers
+    stop = threading.Event()
+    previous = {
+        signum: signal.signal(signum, lambda *args: stop.set())
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    logger.info(f"Watching {watcher.directory} for new files")
+
+    try:
+        with (
+            parser_pool(workers, settings.queue_size)
+            if workers > 1 else nullcontext()
+        ) as pool:
+            for batch in micro_batches(
+                watcher,
+                settings.watch_batch_files,
+                settings.watch_batch_mb * 2**20,
+                settings.watch_batch_seconds,
+                stop,
+            ):
+                logger.info(f"Ingesting {len(batch)} new files")
+                try:
+                    ingest_paths(batch, pool)
+                except Exception as error:
+                    logger.error(f"Failed to ingest new files: {error}")
+    finally:
+        watcher.close()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    logger.info("Stopped watching.")
+
+
+def report(engine, metrics=None):
+    """print spend, clicks and conversions by channel"""
+    from database.report import report_table
+
+    with timed(metrics, "report"):
+        report_table(engine)
+
+
+def sql_merge_reason(settings):
+    """why this run's parsed frames cannot make the master report, if so"""
+    if settings.watch:
+        # frames kept for a pandas merge would grow without bound
+        return "Watch mode"
+    if settings.incremental:
+        # files loaded by earlier runs are not parsed again
+        return "Incremental ingestion"
+    if settings.dedupe:
+        # frames still hold the rows dedupe kept out of the tables
+        return "Deduplication"
+    return None
+
+
+def merge(settings, engine, metrics=None, frames=None):
+    """write the master report into processed_directory.
+
+    The report is joined in SQL from the loaded tables, unless frames
+    parsed by this run's ingest are given to merge in pandas. Either
+    way it is written a chunk at a time, with the run's metadata in a
+    .meta.json file beside it. Returns the report's path.
+    """
+    from etl.etl import DEFAULT_CHUNKSIZE
+
+    logger.info(f"Write master report to {settings.processed_directory}")
+    path = os.path.join(
+        settings.processed_directory,
+        f"summary_report_{datetime.now()}.{settings.report_format}",
+    )
+    chunksize = settings.chunksize or DEFAULT_CHUNKSIZE
+
+    merge_mode = "pandas" if frames is not None else "sql"
+    column_types = None
+    with timed(metrics, "merge", mode=merge_mode) as stage:
+        if frames is None:
+            writer = make_writer(settings, engine)
+            # the report is typed from the tables, not from its first chunk
+            column_types = writer.master_columns()
+            chunks = writer.iter_master(
+                chunksize, settings.report_from, settings.report_to
+            )
+        else:
+            from etl.pipeline import merge_frames
+
+            df_master = merge_frames(
+                frames["ads_data"],
+                frames["performance_data"],
+                frames["clickstreams_data"],
+            )
+            chunks = (
+                df_master.iloc[start:start + chunksize]
+                for start in range(0, len(df_master), chunksize)
+            )
+        stage["rows"] = write_report(
+            chunks, path, settings.data_directory, column_types
+        )
+    return path
+
+
+def write_report(chunks, path, data_directory, column_types=None):
+    """stream chunks into the report at path, returns the rows written"""
+    from database.database_writer import DatabaseWriter
+    from etl.report_writer import ReportWriter, write_sidecar
+
+    with ReportWriter(path, column_types) as report:
+        for chunk in chunks:
+            report.write(chunk)
+
+    write_sidecar(path, DatabaseWriter.metadata_row(
+        "merged_pipeline", data_directory, report.row_count, report.columns
+    ))
+    return report.row_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=COMMANDS,
+        help="run one stage, the whole pipeline by default",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep ingesting files as they arrive (ingest or no command)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="write a cProfile and allocation sites per file to the logs",
+    )
+    args = parser.parse_args(argv)
+    command = args.command
+
+    # Load config object
+    config = get_config()
+    if not config:
+        print("Failed to load configuration. Exiting.")
+        return 1
+    settings = read_settings(config)
+    settings.watch = settings.watch or args.watch
+    settings.profile = settings.profile or args.profile
+    setup(settings)
+    logger.info(f"Application started: {command or 'all stages'}.")
+
+    if command == "validate":
+        return 1 if validate(settings) else 0
+
+    stages = [command] if command else ["ingest", "report", "merge"]
+    if command is None and settings.claims:
+        # other workers may still be loading, so the totals and the
+        # master report would only cover part of the data
+        logger.warning(
+            "Shared ingestion only ingests; run report and merge once"
+            " every worker is done."
+        )
+        stages = ["ingest"]
+
+    reason = sql_merge_reason(settings)
+    if reason and not settings.merge_in_sql and "merge" in stages:
+        logger.warning(f"{reason} builds the master report in SQL.")
+        settings.merge_in_sql = True
+
+    metrics = start_metrics(settings)
     engine = get_db_engine()
     if not engine:
         logger.error("Failed to create engine.")
-        exit(1)
+        return 1
 
-    writer = DatabaseWriter(engine)
+    frames = None
+    if command is None and "merge" in stages and not settings.merge_in_sql:
+        frames = {table_name: [] for table_name in FACT_TABLES}
 
-    for filename in os.listdir(data_directory):
-        fullpath = os.path.join(data_directory, filename)
+    if "ingest" in stages:
         try:
-            if fnmatch.fnmatch(filename, "*.csv"):
-                loader = CSVLoader(fullpath)
-            elif fnmatch.fnmatch(filename, "*.json"):
-                loader = JSONLoader(fullpath)
-            elif fnmatch.fnmatch(filename, "*.txt"):
-                loader = TextLoader(fullpath)
-            else:
-                logger.warning(f"Unsupported file format: {filename}")
-                continue
-
-            df = loader.load()
-            if df is not None and not df.empty:
-                if isinstance(loader, CSVLoader):
-                    csv_frames.append(df)
-                    logger.info(f"Preparing to insert {len(df)} rows")
-                    writer.load_to_database(df, "ads_data")
-                elif isinstance(loader, JSONLoader):
-                    json_frames.append(df)
-                    logger.info(f"Preparing to insert {len(df)} rows")
-                    writer.load_to_database(df, "performance_data")
-                elif isinstance(loader, TextLoader):
-                    text_frames.append(df)
-                    logger.info(f"Preparing to insert {len(df)} rows")
-                    writer.load_to_database(df, "clickstreams_data")
-            else:
-                logger.warning(f"No data returned for {filename}")
+            ingest(settings, engine, metrics, frames)
         except Exception as error:
-            logger.error(f"Failed to load {filename}:{error}")
-except Exception as error:
-    logger.error(f"Error reading files into dataframe and database: {error}")
-
-# Merge all files together
-csv_df = (
-    pd.concat(csv_frames, ignore_index=True) if csv_frames else pd.DataFrame()
-)
-json_df = (
-    pd.concat(
-        json_frames, ignore_index=True) if json_frames else pd.DataFrame()
-)
-text_df = (
-    pd.concat(
-        text_frames, ignore_index=True) if text_frames else pd.DataFrame()
-)
-
-# Join
-if not csv_df.empty and not json_df.empty:
-    merged_df = csv_df.merge(
-        json_df, on=["client", "date", "channel"], how="left")
-else:
-    merged_df = csv_df
-
-if not merged_df.empty and not text_df.empty:
-    df_master = merged_df.merge(
-        text_df, on=["client", "date", "channel"], how="left"
+            logger.error(
+                f"Error reading files into dataframe and database: {error}"
+            )
+        logger.info("File ingestion finished...")
+    if "report" in stages:
+        report(engine, metrics)
+    if "merge" in stages:
+        merge(settings, engine, metrics, frames)
+
+    if metrics is not None and settings.metrics_format == "prometheus":
+        metrics.write_prometheus(
+            os.path.join(settings.log_directory, "metrics.prom")
         )
-else:
-    df_master = merged_df
-
-logger.info("File ingestion finished...")
-
-DatabaseWriter.report_table(engine)
-
-# Save the master report
-logger.info(f"Write CSV report to {processed_directory}")
-path = (
-    os.path.join(processed_directory, f"summary_report_{datetime.now()}.csv")
-)
-df_master = DatabaseWriter.build_metadata(
-    "merged_pipeline", data_directory, df_master
-)
-df_master.to_csv(path, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def engine():
+    return create_engine("sqlite://")
+
+
+@pytest.fixture
+def ads():
+    """builds Dummy's Google ads rows, one per day of August 2025"""
+    def build(days, spend=1.0):
+        return pd.DataFrame({
+            "client": "Dummy",
+            "date": [f"2025-08-{day:02d}" for day in days],
+            "channel": "Google",
+            "spend_usd": spend,
+        })
+
+    return build
@@ -0,0 +1,52 @@
+import json
+import pytest
+from sqlalchemy import create_engine
+from src.benchmarks.generate import generate
+from src.benchmarks.run import main, run
+from src.database.database_writer import DatabaseWriter
+from src.etl.etl import CSVLoader, JSONLoader, TextLoader
+
+
+class TestBenchmarks:
+
+    def test_generate(self, tmp_path):
+        paths = generate(tmp_path, files=2, rows=50, clients=3, channels=12)
+
+        assert len(paths) == 6
+        ads = CSVLoader(paths[0]).load()
+        assert len(ads) == 50
+        assert ads["client"].nunique() <= 3
+        assert len(JSONLoader(paths[1]).load()) == 50
+        clicks = TextLoader(paths[2]).load()
+        assert list(clicks.columns) == ["client", "date", "channel", "event"]
+
+    def test_run(self, tmp_path):
+        paths = generate(tmp_path, files=1, rows=20)
+        engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+
+        results = run(paths, engine, repeat=1)
+
+        assert results["load_ads_data"]["rows"] == 20
+        assert results["merge"]["rows"] >= 20
+        assert results["write_upsert_performance_data"]["seconds"] > 0
+
+    def test_run_fails_on_failed_write(self, tmp_path, monkeypatch):
+        paths = generate(tmp_path, files=1, rows=20)
+        engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+        monkeypatch.setattr(
+            DatabaseWriter, "load_to_database", lambda *args: False
+        )
+
+        with pytest.raises(RuntimeError, match="bench_ads_data failed"):
+            run(paths, engine, repeat=1)
+
+    def test_main_writes_json(self, tmp_path):
+        output = tmp_path / "bench.json"
+
+        main(["--files", "1", "--rows", "10", "--repeat", "1",
+              "--output", str(output)])
+
+        report = json.loads(output.read_text())
+        assert report["database"] == "sqlite"
+        assert report["params"]["rows"] == 10
+        assert "write_append_ads_data" in report["results"]
@@ -0,0 +1,111 @@
+import os
+import pytest
+from src.etl.cache import ParsedFileCache
+from src.etl.etl import CSVLoader
+from src.etl.validation import RowValidator
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+    path.write_text(
+        "Client,Date,Channel,Campaign_id,Spend_usd\n"
+        "Dummy,2024-06-21,Google,camp_007,754.47"
+    )
+    return str(path)
+
+
+def cached_loader(fullpath, cache):
+    loader = CSVLoader(fullpath)
+    loader.cache = cache
+    return loader
+
+
+class TestParsedFileCache:
+
+    def test_hit_skips_raw_file(self, tmp_path, csv_file, monkeypatch):
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        expected = cached_loader(csv_file, cache).load()
+
+        def fail(self):
+            raise AssertionError("raw file was read")
+
+        monkeypatch.setattr(CSVLoader, "_read_source", fail)
+        monkeypatch.setattr(CSVLoader, "_validate_file", fail)
+
+        df = cached_loader(csv_file, cache).load()
+        assert df.equals(expected)
+
+    def test_chunks(self, tmp_path, monkeypatch):
+        path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        path.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            + "".join(
+                f"Dummy,2025-08-{day},Google,camp_{day},{day}.5\n"
+                for day in range(10, 15)
+            )
+        )
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        expected = list(cached_loader(str(path), cache).iter_chunks(2))
+
+        def fail(self, chunksize):
+            raise AssertionError("raw file was read")
+
+        monkeypatch.setattr(CSVLoader, "_read_chunks", fail)
+
+        chunks = list(cached_loader(str(path), cache).iter_chunks(2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        for chunk, want in zip(chunks, expected):
+            assert chunk.equals(want.reset_index(drop=True))
+        assert chunks[0]["channel"].dtype == "category"
+
+    def test_chunks_read_partly_are_not_cached(self, tmp_path, csv_file):
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        chunks = cached_loader(csv_file, cache).iter_chunks(1)
+
+        next(chunks)
+        chunks.close()
+
+        assert os.listdir(cache.directory) == []
+
+    def test_changed_file_invalidates(self, tmp_path, csv_file):
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        cached_loader(csv_file, cache).load()
+
+        with open(csv_file, "a") as f:
+            f.write("\nDummy,2024-06-22,Google,camp_007,1.00")
+
+        assert len(cached_loader(csv_file, cache).load()) == 2
+        assert len(os.listdir(cache.directory)) == 1
+
+    def test_row_checks_invalidate(self, tmp_path, csv_file):
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        assert len(cached_loader(csv_file, cache).load()) == 1
+
+        loader = cached_loader(csv_file, cache)
+        loader.validator = RowValidator(str(tmp_path), channels=["Bing"])
+
+        assert loader.load().empty
+
+    def test_eviction(self, tmp_path):
+        cache = ParsedFileCache(str(tmp_path / "cache"), 2**20)
+        paths = []
+
+        for day in range(18, 21):
+            path = tmp_path / f"AD_SPEND_DUMMY_202508{day}.csv"
+            path.write_text(
+                "Client,Date,Channel,Campaign_id,Spend_usd\n"
+                f"Dummy,2025-08-{day},Google,camp_007,1.00"
+            )
+            paths.append(str(path))
+            loader = cached_loader(str(path), cache)
+            loader.load()
+            _, entry = cache._entry(loader)
+            # leave room for two entries, with distinct use times
+            cache.max_bytes = 2 * os.path.getsize(entry) + 100
+            os.utime(entry, (day, day))
+
+        names = os.listdir(cache.directory)
+        assert len(names) == 2
+        oldest = cached_loader(paths[0], cache)
+        assert os.path.basename(cache._entry(oldest)[1]) not in names
@@ -0,0 +1,82 @@
+import os
+import pytest
+import sqlalchemy as sa
+from src.database.claims import FileClaims, claims_table
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, size in (("small.csv", 1), ("large.csv", 3)):
+        path = tmp_path / name
+        path.write_text("x" * size)
+        paths.append((str(path), size))
+    return paths
+
+
+def statuses(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(
+            sa.select(claims_table.c.source_path, claims_table.c.status)
+        )
+        return {os.path.basename(path): status for path, status in rows}
+
+
+class TestFileClaims:
+
+    def test_each_file_claimed_once(self, engine, files):
+        first = FileClaims(engine, worker="a")
+        second = FileClaims(engine, worker="b")
+        first.register(files)
+        second.register(files)  # a second worker finds the same files
+
+        assert first.claim() == files[1][0]  # largest first
+        assert second.claim() == files[0][0]
+        assert first.claim() is None
+        assert list(second.claimed()) == []
+
+    def test_finish(self, engine, files):
+        claims = FileClaims(engine, worker="a")
+        claims.register(files)
+        large, small = claims.claimed()
+
+        claims.finish(large)
+        claims.finish(small, ok=False)
+
+        assert statuses(engine) == {"large.csv": "done", "small.csv": "failed"}
+
+    def test_register_again(self, engine, files):
+        claims = FileClaims(engine, worker="a")
+        claims.register(files)
+        for fullpath in claims.claimed():
+            claims.finish(fullpath, ok=fullpath == files[0][0])
+
+        claims.register(files)
+        # the failed file is retried, the loaded one only once it changes
+        assert list(claims.claimed()) == [files[1][0]]
+
+        with open(files[0][0], "a") as f:
+            f.write("more")
+        claims.register([(files[0][0], 5)])
+        assert list(claims.claimed()) == [files[0][0]]
+
+    def test_expired_lease_is_taken_over(self, engine, files):
+        crashed = FileClaims(engine, worker="a", lease_seconds=-1)
+        crashed.register(files[:1])
+        assert crashed.claim() == files[0][0]
+
+        survivor = FileClaims(engine, worker="b")
+        assert survivor.claim() == files[0][0]
+        crashed.finish(files[0][0])  # too late, b holds it now
+
+        assert statuses(engine) == {"small.csv": "claimed"}
+
+    def test_heartbeat_releases_unfinished(self, engine, files):
+        claims = FileClaims(engine, worker="a")
+        claims.register(files)
+
+        with claims.heartbeat():
+            claims.finish(claims.claim())
+            claims.claim()  # never finished, say its parse failed
+
+        assert statuses(engine) == {"large.csv": "done", "small.csv": "failed"}
@@ -0,0 +1,354 @@
+import datetime
+import os
+import threading
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import create_engine
+from sqlalchemy import inspect
+from src.database.database_writer import DatabaseWriter
+from src.etl.metrics import MetricsRecorder
+from src.etl.schemas import CLICKSTREAMS_KEY
+
+
+@pytest.fixture
+def ads_df(ads):
+    return ads([19, 20], spend=[10.0, 20.0])
+
+
+@pytest.fixture
+def pg_engine():
+    """a Postgres engine from TEST_POSTGRES_URL, these tests skip without"""
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    engine = create_engine(url)
+    try:
+        engine.connect().close()
+    except sa.exc.OperationalError as error:
+        pytest.skip(f"Postgres is not reachable: {error}")
+    drop_pg_tables(engine)
+    yield engine
+    drop_pg_tables(engine)
+    engine.dispose()
+
+
+def drop_pg_tables(engine):
+    with engine.begin() as conn:
+        for table_name in ("pytest_ads", "pytest_ads_next"):
+            conn.execute(sa.text(f"DROP TABLE IF EXISTS {table_name} CASCADE"))
+
+
+def daily_ads(days, rows_per_day):
+    dates = pd.date_range("2025-08-01", periods=days).repeat(rows_per_day)
+    return pd.DataFrame({
+        "client": [f"client_{i % 50}" for i in range(len(dates))],
+        "date": dates,
+        "channel": "Google",
+        "spend_usd": 1.5,
+    })
+
+
+def relations(engine, prefix):
+    """name -> kind of the pg_class relations named prefix..."""
+    with engine.connect() as conn:
+        return dict(conn.execute(sa.text(
+            "SELECT relname, relkind FROM pg_class"
+            " WHERE relname LIKE :prefix"
+            " AND relnamespace = to_regnamespace(current_schema())"
+        ), {"prefix": f"{prefix}%"}).fetchall())
+
+
+def read_table(engine, table_name):
+    return pd.read_sql(
+        f"SELECT * FROM {table_name} ORDER BY date", engine
+    )
+
+
+class TestDatabaseWriter:
+
+    def test_unknown_mode(self, engine):
+        with pytest.raises(ValueError, match="Unknown write mode"):
+            DatabaseWriter(engine, mode="merge")
+
+    def test_append(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="append")
+
+        writer.load_to_database(ads_df, "ads_data")
+        writer.load_to_database(ads_df, "ads_data")
+
+        assert len(read_table(engine, "ads_data")) == 4
+
+    def test_replace(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="replace")
+
+        writer.load_to_database(ads_df, "ads_data")
+        writer.load_to_database(ads_df.head(1), "ads_data")
+
+        assert len(read_table(engine, "ads_data")) == 1
+
+    def test_upsert(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="upsert")
+        writer.load_to_database(ads_df, "ads_data")
+
+        update = ads_df.tail(1).assign(spend_usd=99.0)
+        new_day = ads_df.head(1).assign(date="2025-08-21")
+        writer.load_to_database(pd.concat([update, new_day]), "ads_data")
+
+        result = read_table(engine, "ads_data")
+        assert list(result["date"]) == [
+            "2025-08-19", "2025-08-20", "2025-08-21"
+        ]
+        assert list(result["spend_usd"]) == [10.0, 99.0, 10.0]
+
+    def test_upsert_on_natural_key(self, engine, ads_df):
+        writer = DatabaseWriter(
+            engine,
+            mode="upsert",
+            natural_keys={"clickstreams_data": CLICKSTREAMS_KEY},
+            dedupe=False,
+        )
+        events = ads_df.head(1).drop(columns="spend_usd").merge(
+            pd.DataFrame({"event": ["view", "click", "purchase"]}),
+            how="cross",
+        )
+        writer.load_to_database(events, "clickstreams_data")
+
+        assert writer.load_to_database(events, "clickstreams_data")
+
+        result = read_table(engine, "clickstreams_data")
+        assert sorted(result["event"]) == ["click", "purchase", "view"]
+
+    def test_iter_master(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="append")
+        writer.load_to_database(ads_df, "ads_data")
+        writer.load_to_database(
+            ads_df.drop(columns="spend_usd").assign(clicks=[5, 7]),
+            "performance_data",
+        )
+
+        chunks = list(writer.iter_master(chunksize=1))
+
+        assert [len(chunk) for chunk in chunks] == [1, 1]
+        master = pd.concat(chunks)
+        assert list(master.columns) == [
+            "client", "date", "channel", "spend_usd", "clicks"
+        ]
+        assert sorted(master["clicks"]) == [5, 7]
+
+    def test_iter_master_date_range(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="append")
+        writer.load_to_database(ads_df, "ads_data")
+
+        chunks = writer.iter_master(
+            chunksize=10,
+            since=datetime.date(2025, 8, 20),
+            until=datetime.date(2025, 8, 21),
+        )
+
+        assert list(pd.concat(chunks)["spend_usd"]) == [20.0]
+
+    def test_reload(self, engine, ads_df):
+        writer = DatabaseWriter(
+            engine,
+            mode="reload",
+            natural_keys={"ads_data": ("client", "date", "channel")},
+        )
+        writer.load_to_database(ads_df, "ads_data")
+
+        fixed = ads_df.tail(1).assign(spend_usd=99.0)
+        assert writer.load_to_database(fixed, "ads_data")
+
+        result = read_table(engine, "ads_data")
+        assert list(result["spend_usd"]) == [10.0, 99.0]
+        rollup = read_table(engine, "ads_daily_rollup")
+        assert list(rollup["spend_usd"]) == [10.0, 99.0]
+        assert list(rollup["row_count"]) == [1, 1]
+
+    def test_reload_keeps_other_clients(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="reload")
+        acme = ads_df.assign(client="ACME")
+        globex = ads_df.assign(client="GLOBEX", spend_usd=[1.0, 2.0])
+        writer.load_to_database(acme, "ads_data")
+        writer.load_to_database(globex, "ads_data")
+
+        fixed = acme.assign(spend_usd=[11.0, 21.0])
+        assert writer.load_to_database(fixed, "ads_data")
+
+        result = read_table(engine, "ads_data").sort_values(
+            ["client", "date"]
+        )
+        assert list(result["client"]) == ["ACME", "ACME", "GLOBEX", "GLOBEX"]
+        assert list(result["spend_usd"]) == [11.0, 21.0, 1.0, 2.0]
+
+    def test_reload_in_chunks(self, engine, ads_df):
+        writer = DatabaseWriter(
+            engine,
+            mode="reload",
+            natural_keys={"ads_data": ("client", "date", "channel")},
+        )
+        writer.load_to_database(ads_df, "ads_data")
+
+        # a corrected file for both days, in two batches of the same day
+        cleared = set()
+        fixed = ads_df.assign(spend_usd=[11.0, 21.0])
+        meta = fixed.tail(1).assign(channel="Meta", spend_usd=5.0)
+        assert writer.load_to_database(fixed, "ads_data", cleared=cleared)
+        assert writer.load_to_database(meta, "ads_data", cleared=cleared)
+
+        result = read_table(engine, "ads_data")
+        assert list(result["spend_usd"]) == [11.0, 21.0, 5.0]
+
+    def test_reload_needs_date(self, engine, ads_df):
+        writer = DatabaseWriter(engine, mode="reload")
+
+        assert not writer.load_to_database(
+            ads_df.drop(columns="date"), "ads_data"
+        )
+
+    def test_iter_master_without_tables(self, engine):
+        assert list(DatabaseWriter(engine).iter_master(chunksize=1)) == []
+
+    def test_master_columns(self, engine, ads_df):
+        ads_df["date"] = pd.to_datetime(ads_df["date"])
+        writer = DatabaseWriter(engine, mode="append")
+        writer.load_to_database(ads_df, "ads_data")
+        writer.load_to_database(
+            ads_df.drop(columns="spend_usd").assign(clicks=[5, 7]),
+            "performance_data",
+        )
+
+        types = writer.master_columns()
+
+        # SQLite hands dates over as text
+        assert types == {
+            "client": str,
+            "date": str,
+            "channel": str,
+            "spend_usd": float,
+            "clicks": int,
+        }
+        master = pd.concat(writer.iter_master(chunksize=10))
+        assert list(master.columns) == list(types)
+
+    def test_master_columns_without_tables(self, engine):
+        assert DatabaseWriter(engine).master_columns() == {}
+
+    def test_sql_types(self, engine, ads_df):
+        ads_df = ads_df.astype({"client": "category", "channel": "category"})
+        ads_df["date"] = pd.to_datetime(ads_df["date"])
+        writer = DatabaseWriter(engine, mode="append")
+
+        writer.load_to_database(ads_df, "ads_data")
+
+        types = {
+            column["name"]: str(column["type"])
+            for column in inspect(engine).get_columns("ads_data")
+        }
+        assert types["client"] == "TEXT"
+        assert types["date"] == "DATE"
+        assert len(read_table(engine, "ads_data")) == 2
+
+    def test_metrics(self, engine, ads_df, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+        writer = DatabaseWriter(engine, mode="append", metrics=metrics)
+
+        writer.load_to_database(ads_df, "ads_data")
+
+        (record,) = metrics.records()
+        assert record["stage"] == "write"
+        assert record["table"] == "ads_data"
+        assert record["rows"] == 2
+
+
+class TestPostgresWrites:
+
+    def test_replace_swaps_in_partitioned_table(self, pg_engine):
+        writer = DatabaseWriter(pg_engine, mode="replace", partitioned=True)
+        writer.load_to_database(daily_ads(3, 10), "pytest_ads")
+
+        assert writer.load_to_database(daily_ads(2, 20), "pytest_ads")
+
+        names = relations(pg_engine, "pytest_ads")
+        assert not [name for name in names if "_next" in name]
+        assert "pytest_ads_keys_idx" in names
+        assert {"pytest_ads_p20250801", "pytest_ads_p20250802"} <= set(names)
+        assert "pytest_ads_p20250803" not in names
+        with pg_engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM pytest_ads"
+            )).scalar() == 40
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM pytest_ads_p20250802"
+            )).scalar() == 20
+
+    def test_replace_is_never_seen_empty(self, pg_engine):
+        writer = DatabaseWriter(pg_engine, mode="replace")
+        writer.load_to_database(daily_ads(10, 1000), "pytest_ads")
+        done = threading.Event()
+        counts = []
+
+        def read():
+            with pg_engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT")
+                while not done.is_set():
+                    counts.append(conn.execute(sa.text(
+                        "SELECT COUNT(*) FROM pytest_ads"
+                    )).scalar())
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            assert writer.load_to_database(
+                daily_ads(20, 1000), "pytest_ads"
+            )
+        finally:
+            done.set()
+            reader.join()
+
+        assert counts
+        assert set(counts) <= {10_000, 20_000}
+
+    def test_reload_client_in_partitioned_table(self, pg_engine):
+        writer = DatabaseWriter(pg_engine, mode="reload", partitioned=True)
+        ads = daily_ads(2, 10)
+        writer.load_to_database(ads, "pytest_ads")
+
+        fixed = ads[ads["client"] == "client_0"].assign(spend_usd=9.0)
+        assert writer.load_to_database(fixed, "pytest_ads")
+
+        with pg_engine.connect() as conn:
+            totals = dict(conn.execute(sa.text(
+                "SELECT client, SUM(spend_usd) FROM pytest_ads"
+                " GROUP BY client"
+            )).fetchall())
+        assert len(totals) == 20
+        assert totals["client_0"] == 9.0
+        assert totals["client_1"] == 1.5
+
+    def test_concurrent_appends(self, pg_engine):
+        DatabaseWriter(pg_engine).load_to_database(
+            daily_ads(1, 10), "pytest_ads"
+        )
+        barrier = threading.Barrier(2)
+        results = []
+
+        def append():
+            writer = DatabaseWriter(pg_engine, mode="append")
+            for _ in range(3):
+                barrier.wait()
+                results.append(writer.load_to_database(
+                    daily_ads(10, 2000), "pytest_ads"
+                ))
+
+        workers = [threading.Thread(target=append) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert results == [True] * 6
+        with pg_engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM pytest_ads"
+            )).scalar() == 10 + 6 * 20_000
@@ -1,3 +1,5 @@
+import bz2
+import gzip
 import pytest
 import json
 import logging
@@ -76,6 +78,50 @@ class TestCSVLoader:
         )
         assert any(loader.filename in msg for msg in caplog.messages)
 
+    def test_iter_chunks(self, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        rows = [
+            f"Dummy,2024-06-{day:02d},Google,camp_{day:03d},{day}.5"
+            for day in range(1, 11)
+        ]
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(rows)
+        )
+
+        loader = CSVLoader(str(csv_file))
+        chunks = list(loader.iter_chunks(chunksize=4))
+
+        assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+        assert all("spend_usd" in chunk.columns for chunk in chunks)
+        assert sum(chunk["spend_usd"].sum() for chunk in chunks) == (
+            loader.load()["spend_usd"].sum()
+        )
+
+    def test_natural_key_duplicates(self, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            "Dummy,2024-06-21,Google,camp_007,754.47\n"
+            "Dummy,2024-06-21,Google,camp_007,754.50\n"
+            "Dummy,2024-06-21,Google,camp_008,754.47\n"
+        )
+
+        df = CSVLoader(str(csv_file)).load()
+
+        assert list(df["campaign_id"]) == ["camp_007", "camp_008"]
+        assert list(df["spend_usd"]) == [754.47, 754.47]
+
+    def test_schema_dtypes(self, temp_csv_file, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(Path(temp_csv_file).read_text())
+
+        df = CSVLoader(str(csv_file)).load()
+
+        assert df["client"].dtype == "category"
+        assert df["channel"].dtype == "category"
+        assert df["date"].dtype == "datetime64[ns]"
+        assert df["spend_usd"].dtype == "float64"
+
 
 class TestJSONLoader:
 
@@ -131,6 +177,46 @@ class TestJSONLoader:
         assert result is None
         assert any("Failed to parse JSON" in msg for msg in caplog.messages)
 
+    def test_stream_array(self, tmp_path):
+        records = [
+            {"client": "Dummy", "date": "20250819", "clicks": clicks}
+            for clicks in range(5)
+        ]
+        json_file = tmp_path / "PERFORMANCE_DUMMY_20250819.json"
+        json_file.write_text(json.dumps(records, indent=2))
+
+        loader = JSONLoader(str(json_file), batch_size=2)
+        loader.block_size = 16  # force records to span read blocks
+
+        df = loader.load()
+        assert list(df["clicks"]) == list(range(5))
+        assert [len(chunk) for chunk in loader.iter_chunks(2)] == [2, 2, 1]
+
+    def test_stream_ndjson(self, tmp_path):
+        json_file = tmp_path / "PERFORMANCE_DUMMY_20250819.ndjson"
+        json_file.write_text(
+            "\n".join(
+                json.dumps({"client": "Dummy", "clicks": clicks})
+                for clicks in range(5)
+            )
+        )
+
+        loader = JSONLoader(str(json_file))
+
+        assert loader._validate_file() is None
+        assert list(loader.load()["clicks"]) == list(range(5))
+
+    def test_stream_multibyte_across_blocks(self, tmp_path):
+        records = [{"client": "Café Ünïcode", "clicks": n} for n in range(3)]
+        json_file = tmp_path / "PERFORMANCE_DUMMY_20250819.json"
+        json_file.write_text(json.dumps(records, ensure_ascii=False))
+
+        loader = JSONLoader(str(json_file))
+        loader.block_size = 7  # split the accented characters
+
+        df = loader.load()
+        assert list(df["client"]) == ["Café Ünïcode"] * 3
+
 
 class TestTextLoader:
 
@@ -185,3 +271,121 @@ class TestTextLoader:
 
         assert result is None
         assert any("Failed to parse text" in msg for msg in caplog.messages)
+
+    def test_parse_records(self, tmp_path):
+        txt_file = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        txt_file.write_text(
+            "client: Dummy | date: 08/19/2025 | channel: Google"
+            " | event: view\n"
+            "client: Dummy | date: 08/20/2025 | channel: Google"
+            " | event: click\n"
+        )
+
+        df = TextLoader(str(txt_file)).load()
+
+        assert list(df.columns) == ["client", "date", "channel", "event"]
+        assert len(df) == 2
+        assert list(df["event"]) == ["view", "click"]
+        assert str(df["date"].iloc[1].date()) == "2025-08-20"
+
+    def test_parse_records_mixed_key_order(self, tmp_path):
+        loader = TextLoader(str(tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"))
+
+        df = loader._parse_records(
+            "client: Dummy | date: 08/19/2025 | channel: Google"
+            " | event: view\n"
+            "event: click | channel: Bing | client: Other"
+            " | date: 08/20/2025\n"
+        )
+
+        assert sorted(df.columns) == ["channel", "client", "date", "event"]
+        assert list(df["channel"]) == ["Google", "Bing"]
+        assert list(df["event"]) == ["view", "click"]
+
+    def test_iter_chunks(self, tmp_path):
+        txt_file = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        txt_file.write_text("".join(
+            f"client: Dummy | date: 08/{day:02d}/2025 | channel: Google"
+            " | event: view\n"
+            for day in range(1, 8)
+        ))
+
+        loader = TextLoader(str(txt_file))
+        loader.block_size = 50  # several blocks per chunk
+        chunks = list(loader.iter_chunks(chunksize=3))
+
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert chunks[-1]["date"].iloc[0].day == 7
+
+    def test_empty_file(self, tmp_path):
+        txt_file = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        txt_file.write_text("")
+
+        loader = TextLoader(str(txt_file))
+
+        assert loader.load().empty
+        assert list(loader.iter_chunks()) == []
+
+
+def compress(path, compression):
+    """write a compressed copy of path next to it and return its path"""
+    data = path.read_bytes()
+    if compression == "gzip":
+        target, data = f"{path}.gz", gzip.compress(data)
+    elif compression == "bz2":
+        target, data = f"{path}.bz2", bz2.compress(data)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        target = f"{path}.zst"
+        data = zstandard.ZstdCompressor().compress(data)
+    Path(target).write_bytes(data)
+    return target
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bz2", "zstd"])
+class TestCompressedInput:
+
+    def test_csv(self, tmp_path, compression):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(
+                f"Dummy,2025-08-{day:02d},Google,camp_007,{day}.5"
+                for day in range(1, 6)
+            )
+        )
+        loader = CSVLoader(compress(csv_file, compression))
+
+        assert loader.compression == compression
+        assert loader._validate_file() is None
+        assert loader.load().equals(CSVLoader(str(csv_file)).load())
+        assert [len(df) for df in loader.iter_chunks(2)] == [2, 2, 1]
+
+    def test_json(self, tmp_path, compression):
+        records = [{"client": "Café", "clicks": n} for n in range(5)]
+        json_file = tmp_path / "PERFORMANCE_DUMMY_20250819.json"
+        json_file.write_text(json.dumps(records, ensure_ascii=False))
+        ndjson_file = tmp_path / "PERFORMANCE_DUMMY_20250819.ndjson"
+        ndjson_file.write_text("\n".join(json.dumps(r) for r in records))
+
+        loader = JSONLoader(compress(json_file, compression), batch_size=2)
+        loader.block_size = 7
+
+        assert list(loader.load()["clicks"]) == list(range(5))
+        assert [len(df) for df in loader.iter_chunks(2)] == [2, 2, 1]
+        ndjson = JSONLoader(compress(ndjson_file, compression))
+        assert list(ndjson.load()["client"]) == ["Café"] * 5
+
+    def test_text(self, tmp_path, compression):
+        txt_file = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        txt_file.write_text("".join(
+            f"client: Dummy | date: 08/{day:02d}/2025 | channel: Google"
+            " | event: view\n"
+            for day in range(1, 8)
+        ))
+        loader = TextLoader(compress(txt_file, compression))
+        loader.block_size = 50
+
+        assert len(loader.load()) == 7
+        chunks = list(loader.iter_chunks(chunksize=3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert chunks[-1]["date"].iloc[0].day == 7
@@ -0,0 +1,262 @@
+import json
+import os
+import subprocess
+import sys
+from configparser import ConfigParser
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import create_engine
+from src.database import report, rollups
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def main(monkeypatch):
+    # main.py runs as a script with src/ on the path
+    monkeypatch.syspath_prepend(SRC)
+    import main
+    return main
+
+
+@pytest.fixture
+def settings(main, tmp_path):
+    config = ConfigParser()
+    config.read_dict({
+        "Paths": {
+            "data_directory": str(tmp_path / "raw_data"),
+            "log_directory": str(tmp_path / "logs"),
+            "processed_directory": str(tmp_path / "processed_data"),
+            "cache_directory": str(tmp_path / "cache"),
+            "quarantine_directory": str(tmp_path / "quarantine"),
+        },
+        "Runtime": {"workers": "1", "merge": "sql"},
+    })
+    settings = main.read_settings(config)
+    for directory in ("data_directory", "processed_directory"):
+        os.makedirs(getattr(settings, directory))
+    return settings
+
+
+@pytest.fixture
+def run_main(main, tmp_path, monkeypatch):
+    """main.main() with no command, on tmp_path and a SQLite file"""
+    paths = {
+        directory: str(tmp_path / directory)
+        for directory in (
+            "data_directory", "log_directory", "processed_directory",
+            "cache_directory", "quarantine_directory",
+        )
+    }
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    monkeypatch.setattr(main, "get_db_engine", lambda: engine)
+    os.makedirs(paths["data_directory"])
+    os.makedirs(paths["processed_directory"])
+
+    def run(**runtime):
+        config = ConfigParser()
+        config.read_dict({
+            "Paths": paths, "Runtime": {"workers": "1", **runtime}
+        })
+        monkeypatch.setattr(main, "get_config", lambda: config)
+        return main.main([])
+
+    run.engine = engine
+    run.data_directory = paths["data_directory"]
+    run.processed_directory = paths["processed_directory"]
+    return run
+
+
+def write_ads(directory, day):
+    path = os.path.join(directory, f"AD_SPEND_DUMMY_202508{day:02d}.csv")
+    with open(path, "w") as f:
+        f.write(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            f"Dummy,2025-08-{day:02d},Google,camp_007,{day}.5"
+        )
+    return path
+
+
+class TestMain:
+
+    def test_read_settings(self, settings):
+        assert settings.workers == 1
+        assert settings.merge_in_sql
+        assert settings.write_mode == "append"
+        assert settings.report_from is None
+        assert settings.report_format == "csv"
+        assert not settings.claims
+
+    def test_validate(self, main, settings, capsys):
+        write_ads(settings.data_directory, 19)
+        with open(os.path.join(settings.data_directory, "notes.md"), "w"):
+            pass
+
+        assert main.validate(settings) == 1
+        assert "AD_SPEND_DUMMY_20250819.csv" in capsys.readouterr().out
+
+    def test_ingest_report_merge(self, main, settings, engine, capsys):
+        for day in (19, 20):
+            write_ads(settings.data_directory, day)
+
+        main.ingest(settings, engine)
+        main.report(engine)
+        path = main.merge(settings, engine)
+
+        assert "40.0" in capsys.readouterr().out
+        master = pd.read_csv(path)
+        assert sorted(master["spend_usd"]) == [19.5, 20.5]
+        assert "row_count" not in master
+        with open(f"{path}.meta.json") as f:
+            assert json.load(f)["row_count"] == 2
+
+    def test_merge_parquet_with_empty_first_chunk(
+        self, main, settings, engine
+    ):
+        for day in (19, 20):
+            write_ads(settings.data_directory, day)
+        main.ingest(settings, engine)
+        # only the last day read has performance, so the first chunk's
+        # clicks are all NULL
+        with engine.begin() as conn:
+            conn.execute(sa.text(
+                "CREATE TABLE performance_data"
+                " (client TEXT, date DATE, channel TEXT, clicks BIGINT)"
+            ))
+            conn.execute(sa.text(
+                "INSERT INTO performance_data"
+                " SELECT client, date, channel, 7 FROM ads_data"
+                " ORDER BY rowid DESC LIMIT 1"
+            ))
+        settings.report_format = "parquet"
+        settings.chunksize = 1
+
+        path = main.merge(settings, engine)
+
+        master = pd.read_parquet(path)
+        assert len(master) == 2
+        assert sorted(master["clicks"].dropna()) == [7]
+
+    def test_reload_two_clients_on_one_day(self, main, settings, engine):
+        for client in ("ACME", "GLOBEX"):
+            path = os.path.join(
+                settings.data_directory, f"AD_SPEND_{client}_20250819.csv"
+            )
+            with open(path, "w") as f:
+                f.write(
+                    "Client,Date,Channel,Campaign_id,Spend_usd\n"
+                    f"{client},2025-08-19,Google,camp_007,1.5"
+                )
+        settings.write_mode = "reload"
+
+        main.ingest(settings, engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT client FROM ads_data ORDER BY client"
+            )).scalars().all() == ["ACME", "GLOBEX"]
+
+    def test_incremental_run_merges_in_sql(self, main, run_main):
+        for day in (19, 20):
+            write_ads(run_main.data_directory, day)
+            assert run_main(incremental="true") == 0
+
+        processed = run_main.processed_directory
+        latest = max(
+            path for path in os.listdir(processed) if path.endswith(".csv")
+        )
+        master = pd.read_csv(os.path.join(processed, latest))
+        assert sorted(master["spend_usd"]) == [19.5, 20.5]
+
+    def test_shared_ingestion_only_ingests(self, main, run_main):
+        write_ads(run_main.data_directory, 19)
+
+        assert run_main(claims="true") == 0
+
+        assert os.listdir(run_main.processed_directory) == []
+        with run_main.engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM ads_data"
+            )).scalar() == 1
+
+    def test_ingest_replace_in_chunks(self, main, settings, engine):
+        path = write_ads(settings.data_directory, 19)
+        with open(path, "a") as f:
+            f.write("\nDummy,2025-08-20,Google,camp_007,3.5")
+        settings.write_mode = "replace"
+        settings.chunksize = 1
+
+        main.ingest(settings, engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM ads_data"
+            )).scalar() == 2
+
+    def test_failed_file_saves_write_profile(
+        self, main, settings, engine, monkeypatch
+    ):
+        import tracemalloc
+        from etl import etl, profiling
+
+        def failing_chunks(self, chunksize):
+            yield next(read_chunks(self, chunksize))
+            raise ValueError("disk gone")
+
+        read_chunks = etl.CSVLoader._read_chunks
+        monkeypatch.setattr(etl.CSVLoader, "_read_chunks", failing_chunks)
+        path = write_ads(settings.data_directory, 19)
+        with open(path, "a") as f:
+            f.write("\nDummy,2025-08-20,Google,camp_007,3.5")
+        settings.chunksize = 1
+        settings.profile = True
+
+        main.ingest(settings, engine)
+
+        assert profiling._tracing_sessions == 0
+        assert not tracemalloc.is_tracing()
+        assert any(
+            name.startswith("profile-write-AD_SPEND_DUMMY")
+            for name in os.listdir(settings.log_directory)
+        )
+
+    def test_ingest_with_claims(self, main, settings, tmp_path):
+        # files are claimed from the reader thread, which needs to see
+        # the same database
+        engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+        for day in (19, 20):
+            write_ads(settings.data_directory, day)
+        settings.claims = True
+
+        main.ingest(settings, engine)
+
+        with engine.connect() as conn:
+            assert conn.execute(sa.text(
+                "SELECT status, COUNT(*) FROM ingestion_claims GROUP BY status"
+            )).fetchall() == [("done", 2)]
+            assert conn.execute(sa.text(
+                "SELECT COUNT(*) FROM ads_data"
+            )).scalar() == 2
+
+    def test_commands_import_lazily(self):
+        # importing the CLI, as every command does, must stay cheap
+        code = (
+            "import sys, main;"
+            "print(sorted({'pandas', 'pyarrow', 'sqlalchemy'}"
+            " & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=SRC,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_report_rollup_names(self):
+        assert report.ROLLUP_TABLES == {
+            table_name: rollup.name
+            for table_name, rollup in rollups.ROLLUPS.items()
+        }
@@ -0,0 +1,45 @@
+import os
+import pytest
+from sqlalchemy import create_engine
+from src.database.manifest import IngestionManifest
+
+
+@pytest.fixture
+def manifest():
+    return IngestionManifest(create_engine("sqlite://"))
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+    path.write_text(
+        "Client,Date,Channel,Campaign_id,Spend_usd\n"
+        "Dummy,2024-06-21,Google,camp_007,754.47"
+    )
+    return str(path)
+
+
+class TestIngestionManifest:
+
+    def test_new_file_is_pending(self, manifest, csv_file):
+        assert manifest.pending([csv_file]) == [csv_file]
+
+    def test_loaded_file_is_skipped(self, manifest, csv_file):
+        manifest.pending([csv_file])
+        manifest.record(csv_file, "ads_data", 1, ["client", "date"])
+
+        assert manifest.pending([csv_file]) == []
+
+    def test_touched_file_is_skipped(self, manifest, csv_file):
+        manifest.record(csv_file, "ads_data", 1, ["client", "date"])
+        stat = os.stat(csv_file)
+        os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert manifest.pending([csv_file]) == []
+
+    def test_changed_file_is_pending(self, manifest, csv_file):
+        manifest.record(csv_file, "ads_data", 1, ["client", "date"])
+        with open(csv_file, "a") as f:
+            f.write("\nDummy,2024-06-22,Google,camp_007,1.00")
+
+        assert manifest.pending([csv_file]) == [csv_file]
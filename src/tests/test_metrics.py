@@ -0,0 +1,113 @@
+import threading
+import pytest
+from src.etl.etl import CSVLoader
+from src.etl.metrics import MetricsRecorder, _reset_peak_rss
+from src.etl.pipeline import parse_files
+
+
+def write_csv(directory, day=19):
+    csv_file = directory / f"AD_SPEND_DUMMY_202508{day:02d}.csv"
+    csv_file.write_text(
+        "Client,Date,Channel,Campaign_id,Spend_usd\n"
+        f"Dummy,2025-08-{day:02d},Google,camp_007,754.47"
+    )
+    return str(csv_file)
+
+
+class TestMetricsRecorder:
+
+    def test_stage(self, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+
+        with metrics.stage("outer", file="a.csv") as outer:
+            with metrics.stage("inner") as inner:
+                inner["rows"] = 3
+            outer["rows"] = 3
+
+        records = metrics.records()
+        assert [record["stage"] for record in records] == ["inner", "outer"]
+        assert records[1]["file"] == "a.csv"
+        assert records[1]["seconds"] >= records[0]["seconds"]
+        assert records[1]["peak_rss_bytes"] >= records[0]["peak_rss_bytes"]
+
+    @pytest.mark.skipif(
+        not _reset_peak_rss(), reason="peak memory cannot be reset here"
+    )
+    def test_stage_in_other_thread_keeps_peak(self, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+        allocated = threading.Event()
+        other_opened = threading.Event()
+
+        def other():
+            allocated.wait()
+            with metrics.stage("write"):
+                other_opened.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        with metrics.stage("parse") as parse:
+            block = b"x" * (200 * 2**20)
+            del block
+            allocated.set()
+            other_opened.wait()
+        thread.join()
+
+        assert parse["peak_rss_bytes"] >= 200 * 2**20
+
+    def test_records_of_other_runs_are_ignored(self, tmp_path):
+        path = str(tmp_path / "metrics.jsonl")
+        with MetricsRecorder(path).stage("old"):
+            pass
+
+        metrics = MetricsRecorder(path)
+        with metrics.stage("new"):
+            pass
+
+        assert [record["stage"] for record in metrics.records()] == ["new"]
+
+    def test_loader_stages(self, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+        loader = CSVLoader(write_csv(tmp_path))
+        loader.metrics = metrics
+
+        loader.load()
+
+        stages = {record["stage"]: record for record in metrics.records()}
+        assert list(stages) == [
+            "load.validate",
+            "load.read",
+            "load.parse",
+            "load.to_dataframe",
+            "load.postprocess",
+            "load",
+        ]
+        assert stages["load"]["rows"] == 1
+        assert stages["load"]["file"] == "AD_SPEND_DUMMY_20250819.csv"
+        assert stages["load"]["bytes"] > 0
+
+    def test_parse_files_records_worker_stages(self, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+        paths = [write_csv(tmp_path, day) for day in (19, 20)]
+
+        list(parse_files(paths, workers=2, metrics=metrics))
+
+        loads = [r for r in metrics.records() if r["stage"] == "load"]
+        assert sorted(record["file"] for record in loads) == [
+            "AD_SPEND_DUMMY_20250819.csv",
+            "AD_SPEND_DUMMY_20250820.csv",
+        ]
+
+    def test_write_prometheus(self, tmp_path):
+        metrics = MetricsRecorder(str(tmp_path / "metrics.jsonl"))
+        for _ in range(2):
+            with metrics.stage("write", file='a"b.csv') as stage:
+                stage["rows"] = 5
+
+        metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+
+        text = (tmp_path / "metrics.prom").read_text()
+        assert "# TYPE etl_stage_seconds gauge" in text
+        assert (
+            f'etl_stage_rows{{run_id="{metrics.run_id}",stage="write"'
+            ',file="a\\"b.csv"} 10'
+        ) in text
@@ -0,0 +1,170 @@
+import logging
+import pandas as pd
+from src.etl.etl import CSVLoader, JSONLoader, TextLoader
+import pytest
+from src.etl.pipeline import (
+    Failed,
+    background,
+    iter_batches,
+    loader_class,
+    merge_frames,
+    parse_files,
+    prefetch,
+)
+
+
+def write_files(directory, count):
+    paths = []
+    for day in range(1, count + 1):
+        csv_file = directory / f"AD_SPEND_DUMMY_202508{day:02d}.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            f"Dummy,2025-08-{day:02d},Google,camp_007,{day}.5"
+        )
+        paths.append(str(csv_file))
+    return paths
+
+
+class TestPipeline:
+
+    def test_loader_class(self):
+        assert loader_class("AD_SPEND_DUMMY_20250819.csv") is CSVLoader
+        assert loader_class("PERFORMANCE_DUMMY_20250819.json") is JSONLoader
+        assert loader_class("PERFORMANCE_DUMMY_20250819.ndjson") is JSONLoader
+        assert loader_class("CLICKSTREAMS_DUMMY_20250819.txt") is TextLoader
+        assert loader_class("AD_SPEND_DUMMY_20250819.csv.gz") is CSVLoader
+        assert loader_class("CLICKSTREAMS_DUMMY_20250819.txt.zst") is (
+            TextLoader
+        )
+        assert loader_class("notes.md") is None
+        assert loader_class("notes.md.gz") is None
+
+    def test_parse_files(self, tmp_path):
+        paths = write_files(tmp_path, 5)
+
+        batches = list(parse_files(paths, workers=2, queue_size=1))
+        results = [batch for batch in batches if batch[2] is not None]
+
+        assert sorted(fullpath for fullpath, _, _ in results) == paths
+        assert all(table == "ads_data" for _, table, _ in results)
+        assert sum(len(df) for _, _, df in results) == 5
+        assert sorted(
+            fullpath for fullpath, _, df in batches if df is None
+        ) == paths
+
+    def test_parse_files_streams_chunks(self, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(
+                f"Dummy,2025-08-{day:02d},Google,camp_007,{day}.5"
+                for day in range(1, 6)
+            )
+        )
+        paths = [str(csv_file)] + write_files(tmp_path, 2)
+
+        batches = list(parse_files(paths, workers=2, chunksize=2))
+        streamed = [df for path, _, df in batches if path == str(csv_file)]
+
+        assert [len(df) for df in streamed[:-1]] == [2, 2, 1]
+        assert streamed[-1] is None
+        assert len(batches) == 3 + 1 + 2 * 2
+
+    def test_parse_files_close(self, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(
+                "Dummy,2025-08-19,Google,camp_007,1.5" for _ in range(50)
+            )
+        )
+        paths = [str(csv_file)] + write_files(tmp_path, 3)
+
+        batches = parse_files(paths, workers=2, queue_size=1, chunksize=2)
+        next(batches)
+        batches.close()  # returns once the workers' batches are drained
+
+    def test_parse_files_failure(self, tmp_path, caplog):
+        paths = write_files(tmp_path, 2) + [str(tmp_path / "missing.csv")]
+
+        with caplog.at_level(logging.ERROR):
+            batches = list(parse_files(paths, workers=2))
+
+        frames = [df for _, _, df in batches if isinstance(df, pd.DataFrame)]
+        assert len(frames) == 2
+        assert len([df for _, _, df in batches if df is None]) == 2
+        failed = [
+            path for path, _, df in batches if isinstance(df, Failed)
+        ]
+        assert failed == [paths[-1]]
+        assert any("Failed to load missing.csv" in msg
+                   for msg in caplog.messages)
+
+    def test_background(self):
+        assert list(background(range(10), maxsize=2)) == list(range(10))
+
+    def test_background_error(self):
+        def items():
+            yield 1
+            raise ValueError("bad item")
+
+        results = background(items(), maxsize=1)
+
+        assert next(results) == 1
+        with pytest.raises(ValueError, match="bad item"):
+            next(results)
+
+    def test_background_close_stops_producer(self):
+        produced = []
+
+        def items():
+            for item in range(100):
+                produced.append(item)
+                yield item
+
+        results = background(items(), maxsize=1)
+        next(results)
+        results.close()
+
+        assert len(produced) < 100
+
+    def test_prefetch(self, tmp_path):
+        paths = write_files(tmp_path, 3) + [str(tmp_path / "missing.csv")]
+
+        assert list(prefetch(paths, ahead=2)) == paths
+
+    def test_iter_batches(self, tmp_path):
+        csv_file = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        csv_file.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(
+                f"Dummy,2025-08-{day:02d},Google,camp_007,{day}.5"
+                for day in range(1, 6)
+            )
+        )
+        paths = [str(csv_file), str(tmp_path / "AD_SPEND_X_20250820.csv")]
+
+        batches = list(iter_batches(paths, chunksize=2))
+
+        assert [len(df) for _, _, df in batches[:3]] == [2, 2, 1]
+        assert batches[3] == (str(csv_file), "ads_data", None)
+        # the missing file is closed by its error
+        assert batches[4][0] == paths[1]
+        assert isinstance(batches[4][2], Failed)
+        assert len(batches) == 5
+
+    def test_merge_frames(self):
+        keys = {"client": ["Dummy"], "channel": ["Google"]}
+        csv_df = pd.DataFrame({**keys, "date": ["2025-08-19"], "spend": [1]})
+        json_df = pd.DataFrame({**keys, "date": ["20250819"], "clicks": [2]})
+        text_df = pd.DataFrame({
+            **keys, "date": pd.to_datetime(["2025-08-19"]), "event": ["view"]
+        })
+
+        df = merge_frames([csv_df], [json_df], [text_df])
+
+        assert df.to_dict("records") == [{
+            "client": "Dummy",
+            "date": pd.Timestamp("2025-08-19"),
+            "channel": "Google",
+            "spend": 1,
+            "clicks": 2,
+            "event": "view",
+        }]
@@ -0,0 +1,87 @@
+import logging
+import os
+import subprocess
+import sys
+from src.etl.etl import CSVLoader
+from src.etl.pipeline import iter_batches
+from src.etl.plan import plan_ingestion, scan_file
+
+
+def write_csv(path, rows):
+    path.write_text(
+        "Client,Date,Channel,Campaign_id,Spend_usd\n" + "\n".join(
+            f"Dummy,2025-08-19,Google,camp_{row:03d},1.5"
+            for row in range(rows)
+        )
+    )
+    return str(path)
+
+
+class TestPlan:
+
+    def test_largest_first(self, tmp_path):
+        small = write_csv(tmp_path / "AD_SPEND_DUMMY_20250819.csv", 1)
+        large = write_csv(tmp_path / "AD_SPEND_DUMMY_20250820.csv", 50)
+        text = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        text.write_text(
+            "Client: Dummy | Date: 08/19/2025 | Channel: Google"
+            " | Event: view\n"
+        )
+
+        plan = plan_ingestion([small, str(text), large], workers=2)
+
+        sizes = [entry.size for entry in plan]
+        assert sizes == sorted(sizes, reverse=True)
+        assert {entry.fullpath for entry in plan} == {small, large, str(text)}
+        assert plan[0].fullpath == large
+        assert plan[0].table_name == "ads_data"
+        assert plan[0].size == os.path.getsize(large)
+
+    def test_rejects(self, tmp_path, caplog):
+        notes = tmp_path / "notes.md"
+        notes.write_text("notes")
+        missing = str(tmp_path / "AD_SPEND_DUMMY_20250821.csv")
+
+        with caplog.at_level(logging.WARNING):
+            plan = plan_ingestion([str(notes), missing], workers=2)
+
+        assert plan == []
+        assert any("notes.md" in msg for msg in caplog.messages)
+        assert any("Rejected" in msg for msg in caplog.messages)
+
+    def test_header_warning(self, tmp_path, caplog):
+        text = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        text.write_text("Client: Dummy | Date: 08/19/2025\n")
+
+        with caplog.at_level(logging.WARNING):
+            entry = scan_file(str(text))
+
+        assert entry.table_name == "clickstreams_data"
+        assert any("2 fields per line" in msg for msg in caplog.messages)
+
+    def test_planned_files_skip_validation(self, tmp_path, monkeypatch):
+        path = write_csv(tmp_path / "AD_SPEND_DUMMY_20250819.csv", 3)
+
+        def fail(self):
+            raise AssertionError("file was validated again")
+
+        monkeypatch.setattr(CSVLoader, "_validate_file", fail)
+
+        batches = list(iter_batches([path], chunksize=2, validated=True))
+        assert [len(df) for _, _, df in batches[:-1]] == [2, 1]
+
+    def test_plan_imports_no_dataframes(self):
+        # validate only plans, so it must start without pandas or pyarrow
+        code = (
+            "import sys, etl.plan;"
+            "print(sorted({'numpy', 'pandas', 'pyarrow'} & set(sys.modules)))"
+        )
+        src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=src,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip() == "[]"
@@ -0,0 +1,79 @@
+import pickle
+import threading
+import tracemalloc
+from src.etl.etl import CSVLoader
+from src.etl.profiling import Profiler
+
+
+def write_ads(directory, rows=3):
+    path = directory / "AD_SPEND_DUMMY_20250819.csv"
+    path.write_text(
+        "Client,Date,Channel,Campaign_id,Spend_usd\n"
+        + "Dummy,2025-08-19,Google,camp_007,1.5\n" * rows
+    )
+    return str(path)
+
+
+class TestProfiler:
+
+    def test_profile_load(self, tmp_path):
+        loader = CSVLoader(write_ads(tmp_path))
+        loader.profiler = Profiler(str(tmp_path / "logs"))
+
+        loader.load()
+
+        names = sorted(path.name for path in (tmp_path / "logs").iterdir())
+        assert [name.rsplit(".", 1)[-1] for name in names] == ["prof", "txt"]
+        assert names[0].startswith("profile-load-AD_SPEND_DUMMY")
+        report = (tmp_path / "logs" / names[1]).read_text()
+        assert "_load" in report
+        assert "Top allocation sites" in report
+        assert not tracemalloc.is_tracing()
+
+    def test_profile_chunks_as_one_file(self, tmp_path):
+        loader = CSVLoader(write_ads(tmp_path, rows=5))
+        loader.profiler = Profiler(str(tmp_path / "logs"))
+
+        assert len(list(loader.iter_chunks(2))) == 3
+
+        assert len(list((tmp_path / "logs").glob("*.txt"))) == 1
+        assert not tracemalloc.is_tracing()
+
+    def test_resumed_session(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+        session = profiler.session("write", "/data/a.csv")
+
+        for _ in range(3):
+            with session:
+                sum(range(1000))
+
+        path = session.save()
+        assert "write a.csv" in open(path).read()
+        assert session.save() is None  # saved once
+
+    def test_overlapping_sessions(self, tmp_path):
+        # one profiler per process on newer Pythons; the other session
+        # must still finish with its timing and allocations
+        profiler = Profiler(str(tmp_path))
+        entered = threading.Event()
+        release = threading.Event()
+
+        def other():
+            with profiler.profile("load", "b.csv"):
+                entered.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        entered.wait(5)
+        with profiler.profile("write", "a.csv"):
+            sum(range(1000))
+        release.set()
+        thread.join()
+
+        assert len(list(tmp_path.glob("*.txt"))) == 2
+        assert not tracemalloc.is_tracing()
+
+    def test_pickles_for_workers(self, tmp_path):
+        profiler = pickle.loads(pickle.dumps(Profiler(str(tmp_path))))
+        assert profiler.directory == str(tmp_path)
@@ -0,0 +1,85 @@
+import datetime
+import json
+import pandas as pd
+import pytest
+from src.etl.report_writer import ReportWriter, report_format, write_sidecar
+
+
+@pytest.fixture
+def chunks():
+    return [
+        pd.DataFrame({"channel": ["Google", "Meta"], "source": [None, None]}),
+        pd.DataFrame({"channel": ["TikTok"], "source": ["email"]}),
+    ]
+
+
+def read_report(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class TestReportWriter:
+
+    @pytest.mark.parametrize("extension", ["csv", "csv.gz", "parquet"])
+    def test_write_chunks(self, tmp_path, chunks, extension):
+        path = str(tmp_path / f"report.{extension}")
+
+        with ReportWriter(path) as report:
+            for chunk in chunks:
+                report.write(chunk)
+
+        df = read_report(path)
+        assert report.row_count == 3
+        assert report.columns == ["channel", "source"]
+        assert list(df["channel"]) == ["Google", "Meta", "TikTok"]
+        assert df["source"].iloc[2] == "email"
+
+    def test_parquet_typed_from_source_columns(self, tmp_path):
+        path = str(tmp_path / "report.parquet")
+        column_types = {"date": datetime.date, "clicks": int}
+        first = pd.DataFrame({
+            "date": [datetime.date(2024, 1, 1)],
+            "clicks": [None],
+        })
+        second = pd.DataFrame({
+            "date": [datetime.date(2024, 1, 2)],
+            "clicks": [7],
+        })
+
+        with ReportWriter(path, column_types) as report:
+            report.write(first)
+            report.write(second)
+
+        df = read_report(path)
+        assert report.row_count == 2
+        assert str(df["clicks"].dtype) == "float64"
+        assert pd.isna(df["clicks"].iloc[0])
+        assert df["clicks"].iloc[1] == 7
+        assert list(df["date"]) == [
+            datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)
+        ]
+
+    def test_no_chunks(self, tmp_path):
+        path = str(tmp_path / "report.csv")
+
+        with ReportWriter(path) as report:
+            pass
+
+        assert report.row_count == 0
+        assert report.columns == []
+        assert open(path).read() == ""
+
+    def test_report_format(self):
+        assert report_format("a.b.csv") == "csv"
+        assert report_format("report.csv.gz") == "csv.gz"
+        with pytest.raises(ValueError):
+            report_format("report.xlsx")
+
+    def test_write_sidecar(self, tmp_path):
+        path = str(tmp_path / "report.csv")
+
+        sidecar = write_sidecar(path, {"row_count": 3})
+
+        assert sidecar == f"{path}.meta.json"
+        assert json.load(open(sidecar)) == {"row_count": 3}
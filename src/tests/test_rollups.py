@@ -0,0 +1,89 @@
+import pandas as pd
+from src.database.database_writer import DatabaseWriter
+
+
+def rollup(engine, table_name="ads_daily_rollup"):
+    df = pd.read_sql(f"SELECT * FROM {table_name} ORDER BY date", engine)
+    return df.drop(columns="channel")
+
+
+def fact_totals(engine):
+    return pd.read_sql(
+        "SELECT date, SUM(spend_usd) AS spend_usd, COUNT(*) AS row_count"
+        " FROM ads_data GROUP BY date ORDER BY date",
+        engine,
+    )
+
+
+class TestRollups:
+
+    def test_append(self, engine, ads):
+        writer = DatabaseWriter(engine, mode="append")
+
+        writer.load_to_database(ads([19, 20], spend=[10.0, 20.0]), "ads_data")
+        writer.load_to_database(ads([20], spend=1.0), "ads_data")
+
+        df = rollup(engine)
+        assert list(df["spend_usd"]) == [10.0, 21.0]
+        assert list(df["row_count"]) == [1, 2]
+
+    def test_upsert_replaces_overwritten_rows(self, engine, ads):
+        writer = DatabaseWriter(engine, mode="upsert")
+
+        writer.load_to_database(ads([19, 20], spend=[10.0, 20.0]), "ads_data")
+        writer.load_to_database(ads([20], spend=5.0), "ads_data")
+
+        df = rollup(engine)
+        assert list(df["spend_usd"]) == [10.0, 5.0]
+        assert list(df["row_count"]) == [1, 1]
+        assert list(fact_totals(engine)["spend_usd"]) == [10.0, 5.0]
+
+    def test_replace(self, engine, ads):
+        writer = DatabaseWriter(engine, mode="append")
+        writer.load_to_database(ads([19, 20], spend=[10.0, 20.0]), "ads_data")
+
+        writer.load_to_database(
+            ads([21], spend=7.0), "ads_data", mode="replace"
+        )
+
+        df = rollup(engine)
+        assert list(df["spend_usd"]) == [7.0]
+
+    def test_backfill(self, engine, ads):
+        ads([19, 20], spend=[10.0, 20.0]).to_sql(
+            "ads_data", engine, index=False
+        )
+        writer = DatabaseWriter(engine, mode="append")
+
+        writer.load_to_database(ads([19, 20], spend=[1.0, 2.0]), "ads_data")
+
+        df = rollup(engine)
+        assert list(df["spend_usd"]) == [11.0, 22.0]
+        assert list(df["row_count"]) == [2, 2]
+
+    def test_performance(self, engine, ads):
+        df = ads([19, 20], spend=0.0).drop(columns="spend_usd").assign(
+            impressions=[100, 200], clicks=[3, 4], conversions=[1, 0]
+        )
+        writer = DatabaseWriter(engine, mode="append")
+
+        writer.load_to_database(df, "performance_data")
+        writer.load_to_database(df, "performance_data")
+
+        totals = rollup(engine, "performance_daily_rollup")
+        assert list(totals["clicks"]) == [6, 8]
+        assert list(totals["conversions"]) == [2, 0]
+
+    def test_report_table_reads_rollups(self, engine, ads, capsys):
+        writer = DatabaseWriter(engine, mode="append")
+        writer.load_to_database(ads([19, 20], spend=[10.0, 20.0]), "ads_data")
+        writer.load_to_database(
+            ads([19, 20], spend=0.0).assign(clicks=[3, 4], conversions=[1, 0]),
+            "performance_data",
+        )
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM ads_data")
+
+        DatabaseWriter.report_table(engine)
+
+        assert "30.0" in capsys.readouterr().out
@@ -0,0 +1,60 @@
+import pandas as pd
+from src.etl.schemas import (
+    PERFORMANCE_SCHEMA,
+    align_categories,
+    apply_schema,
+    concat_frames,
+)
+
+
+class TestSchemas:
+
+    def test_apply_schema(self):
+        df = pd.DataFrame({
+            "client": ["Dummy", "Dummy"],
+            "date": ["2025-08-19", "2025-08-20"],
+            "channel": ["Google", "Bing"],
+            "impressions": ["100", "200"],
+            "clicks": [1, 2],
+            "conversions": [0, 1],
+            "cost_per_click": ["0.5", "1.25"],
+        })
+
+        df = apply_schema(df, PERFORMANCE_SCHEMA)
+
+        assert df["client"].dtype == "category"
+        assert df["date"].dtype == "datetime64[ns]"
+        assert df["impressions"].dtype == "int32"
+        assert df["cost_per_click"].dtype == "float64"
+
+    def test_apply_schema_bad_values(self):
+        df = pd.DataFrame({
+            "clicks": ["1", "many"],
+            "date": ["2025-08-19", "soon"],
+        })
+
+        df = apply_schema(df, PERFORMANCE_SCHEMA)
+
+        assert df["clicks"].dtype == "Int32"
+        assert df["clicks"].isna().tolist() == [False, True]
+        assert df["date"].isna().tolist() == [False, True]
+
+    def test_concat_frames_keeps_categories(self):
+        first = pd.DataFrame({"channel": ["Google"]}, dtype="category")
+        second = pd.DataFrame({"channel": ["Bing"]}, dtype="category")
+
+        df = concat_frames([first, pd.DataFrame(), second])
+
+        assert df["channel"].dtype == "category"
+        assert list(df["channel"]) == ["Google", "Bing"]
+
+    def test_align_categories(self):
+        left = pd.DataFrame({"channel": ["Google"]}, dtype="category")
+        right = pd.DataFrame({"channel": ["Bing"]}, dtype="category")
+
+        align_categories([left, right], ["channel"])
+
+        assert (
+            list(left["channel"].cat.categories)
+            == list(right["channel"].cat.categories)
+        )
@@ -0,0 +1,72 @@
+import datetime
+import pandas as pd
+import pytest
+from src.database.database_writer import DatabaseWriter
+from src.database.seen_keys import key_hashes
+
+KEY = ("client", "date", "channel")
+
+
+@pytest.fixture
+def writer(engine):
+    return DatabaseWriter(
+        engine, mode="append", natural_keys={"ads_data": KEY}
+    )
+
+
+def count(engine, table_name="ads_data"):
+    query = f"SELECT COUNT(*) AS n FROM {table_name}"
+    return pd.read_sql(query, engine)["n"][0]
+
+
+class TestSeenKeys:
+
+    def test_key_hashes_ignore_dtypes(self):
+        parsed = pd.DataFrame({
+            "client": pd.Series(["Dummy"], dtype="category"),
+            "date": pd.to_datetime(["2025-08-19"]),
+            "channel": ["Google"],
+        })
+        stored = pd.DataFrame({
+            "client": ["Dummy"],
+            "date": [datetime.date(2025, 8, 19)],
+            "channel": ["Google"],
+        })
+
+        assert key_hashes(parsed, KEY).equals(key_hashes(stored, KEY))
+
+    def test_append_drops_loaded_rows(self, engine, writer, ads):
+        writer.load_to_database(ads([18, 19]), "ads_data")
+        writer.load_to_database(ads([19, 20, 20]), "ads_data")
+
+        assert count(engine) == 3
+        assert count(engine, "ads_data_keys") == 3
+
+    def test_backfill(self, engine, writer, ads):
+        ads([18, 19]).to_sql("ads_data", engine, index=False)
+
+        writer.load_to_database(ads([19, 20]), "ads_data")
+
+        assert count(engine) == 3
+
+    def test_replace_starts_afresh(self, engine, writer, ads):
+        writer.load_to_database(ads([18, 19]), "ads_data")
+
+        writer.load_to_database(ads([19]), "ads_data", mode="replace")
+        writer.load_to_database(ads([19, 20]), "ads_data")
+
+        assert count(engine) == 2
+
+    def test_upsert_keeps_redelivered_rows(self, engine, writer, ads):
+        writer.load_to_database(ads([19]), "ads_data", mode="upsert")
+
+        writer.load_to_database(ads([19], spend=5), "ads_data", mode="upsert")
+
+        spend = pd.read_sql("SELECT spend_usd FROM ads_data", engine)
+        assert spend["spend_usd"].tolist() == [5.0]
+
+    def test_other_tables_untouched(self, engine, writer, ads):
+        writer.load_to_database(ads([19]), "performance_data")
+        writer.load_to_database(ads([19]), "performance_data")
+
+        assert count(engine, "performance_data") == 2
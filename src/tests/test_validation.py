@@ -0,0 +1,169 @@
+import json
+import pandas as pd
+from src.etl.etl import CSVLoader, TextLoader
+from src.etl.schemas import ADS_REQUIRED, ADS_SCHEMA, apply_schema
+from src.etl.validation import RowValidator
+
+
+def read_quarantine(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestRowValidator:
+
+    def test_check(self, tmp_path):
+        raw_df = pd.DataFrame({
+            "client": ["Dummy", "Dummy", "", "Dummy"],
+            "date": ["2025-08-19", "someday", "2025-08-19", "2025-08-19"],
+            "channel": ["Google", "Google", "Google", "Fax"],
+            "campaign_id": ["camp_007"] * 4,
+            "spend_usd": [1.5, 2.5, -3.0, 4.5],
+        })
+        raw = dict(raw_df.items())
+        df = apply_schema(raw_df, ADS_SCHEMA)
+        validator = RowValidator(str(tmp_path), channels=["Google"])
+
+        failed, reasons = validator.check(df, raw, ADS_REQUIRED)
+
+        assert list(failed) == [False, True, True, True]
+        assert list(reasons) == [
+            "unparseable date",
+            "missing client; negative spend_usd",
+            "unknown channel",
+        ]
+
+    def test_missing_column(self, tmp_path):
+        df = pd.DataFrame({"client": ["Dummy"], "date": ["2025-08-19"]})
+
+        failed, reasons = RowValidator(str(tmp_path)).check(
+            df, dict(df.items()), ("client", "channel")
+        )
+
+        assert list(failed) == [True]
+        assert list(reasons) == ["missing column channel"]
+
+    def test_any_channel_without_channels(self, tmp_path):
+        df = pd.DataFrame({"channel": ["Fax"]})
+
+        failed, _ = RowValidator(str(tmp_path)).check(
+            df, dict(df.items()), ("channel",)
+        )
+
+        assert not failed.any()
+
+
+class TestQuarantine:
+
+    def test_csv_rows(self, tmp_path):
+        path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        path.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            "Dummy,2025-08-19,Google,camp_007,1.5\n"
+            "Dummy,2025-08-19,Google,camp_008,-2\n"
+            "Dummy,19/08/2025x,Google,camp_009,3.5\n"
+        )
+        loader = CSVLoader(str(path))
+        loader.validator = RowValidator(str(tmp_path / "quarantine"))
+
+        df = loader.load()
+
+        assert list(df["campaign_id"]) == ["camp_007"]
+        assert loader.rejected == 2
+        rows = read_quarantine(
+            tmp_path / "quarantine" / "AD_SPEND_DUMMY_20250819.csv.jsonl"
+        )
+        assert [row["reason"] for row in rows] == [
+            "negative spend_usd", "unparseable date"
+        ]
+        assert rows[1]["date"] == "19/08/2025x"  # as delivered
+
+    def test_chunks_share_a_file(self, tmp_path):
+        path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        path.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            + "Dummy,2025-08-19,Google,camp_007,-1\n" * 3
+        )
+        loader = CSVLoader(str(path))
+        loader.validator = RowValidator(str(tmp_path))
+
+        assert list(loader.iter_chunks(2)) == []
+
+        rows = read_quarantine(tmp_path / f"{path.name}.jsonl")
+        assert len(rows) == 3
+
+    def test_malformed_text_lines(self, tmp_path):
+        path = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        path.write_text(
+            "client: Dummy | date: 08/19/2025 | channel: Google"
+            " | event: view\n"
+            "client: Dummy | date: 08/19/2025 | event: click\n"
+            "client: Dummy | date: 08/20/2025 | channel: Google"
+            " | event: click\n"
+        )
+        loader = TextLoader(str(path))
+        loader.validator = RowValidator(str(tmp_path))
+
+        df = loader.load()
+
+        assert list(df["event"]) == ["view", "click"]
+        rows = read_quarantine(tmp_path / f"{path.name}.jsonl")
+        assert rows == [{
+            "line": "client: Dummy | date: 08/19/2025 | event: click",
+            "reason": "expected 4 fields, found 3",
+        }]
+
+    def test_malformed_text_without_quarantine(self, tmp_path):
+        path = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        path.write_text(
+            "client: Dummy | date: 08/19/2025 | channel: Google\n"
+            "client: Dummy | date: 08/19/2025 | channel: Google"
+            " | event: view\n"
+        )
+
+        loader = TextLoader(str(path))
+
+        assert len(loader.load()) == 1
+        assert loader.rejected == 1
+
+    def test_text_trailer_in_last_chunk(self, tmp_path):
+        path = tmp_path / "CLICKSTREAMS_DUMMY_20250819.txt"
+        path.write_text("".join(
+            f"client: Dummy | date: 08/{day}/2025 | channel: Google"
+            " | event: view\n"
+            for day in range(19, 23)
+        ) + "TRAILER\n")
+        loader = TextLoader(str(path))
+        loader.validator = RowValidator(str(tmp_path))
+
+        chunks = list(loader.iter_chunks(2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2]
+        rows = read_quarantine(tmp_path / f"{path.name}.jsonl")
+        assert [row["line"] for row in rows] == ["TRAILER"]
+
+    def test_ragged_csv_rows(self, tmp_path):
+        path = tmp_path / "AD_SPEND_DUMMY_20250819.csv"
+        path.write_text(
+            "Client,Date,Channel,Campaign_id,Spend_usd\n"
+            "Dummy,2025-08-19,Google,camp_007,1.5\n"
+            "Dummy,2025-08-19,Google,camp_008,2.5\n"
+            "Dummy,2025-08-19,Google,camp_009,3.5,extra\n"
+            "Dummy,2025-08-19,Google,camp_010,4.5\n"
+        )
+        loader = CSVLoader(str(path))
+        loader.validator = RowValidator(str(tmp_path))
+
+        chunks = list(loader.iter_chunks(2))
+
+        assert [
+            list(chunk["campaign_id"]) for chunk in chunks
+        ] == [["camp_007", "camp_008"], ["camp_010"]]
+        assert list(CSVLoader(str(path)).load()["campaign_id"]) == [
+            "camp_007", "camp_008", "camp_010"
+        ]
+        rows = read_quarantine(tmp_path / f"{path.name}.jsonl")
+        assert rows == [{
+            "line": "Dummy,2025-08-19,Google,camp_009,3.5,extra",
+            "reason": "expected 5 fields, found 6",
+        }]
@@ -0,0 +1,87 @@
+import os
+import threading
+import pytest
+from src.etl.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    micro_batches,
+)
+
+
+class FakeWatcher:
+    """hands out arrivals one poll at a time, then sets stop"""
+
+    def __init__(self, arrivals, stop):
+        self.arrivals = list(arrivals)
+        self.stop = stop
+
+    def poll(self, timeout):
+        if not self.arrivals:
+            self.stop.set()
+            return []
+        return self.arrivals.pop(0)
+
+
+def write(directory, name, text="data"):
+    path = directory / name
+    path.write_text(text)
+    return str(path)
+
+
+class TestWatch:
+
+    def test_polling_waits_for_settled_files(self, tmp_path):
+        write(tmp_path, "old.csv")
+        watcher = PollingWatcher(str(tmp_path), interval=0)
+
+        new = write(tmp_path, "new.csv")
+        assert watcher.poll(1) == []  # seen once, may still be growing
+        assert watcher.poll(1) == [new]
+        assert watcher.poll(1) == []
+
+    def test_inotify(self, tmp_path):
+        try:
+            watcher = InotifyWatcher(str(tmp_path))
+        except (AttributeError, OSError):
+            pytest.skip("inotify is not available")
+        incoming = tmp_path / "incoming"
+        incoming.mkdir()
+
+        written = write(tmp_path, "a.csv")
+        moved = str(tmp_path / "b.csv")
+        os.rename(write(incoming, "b.csv"), moved)
+
+        paths = []
+        for _ in range(5):
+            paths += watcher.poll(0.2)
+        watcher.close()
+        assert paths == [written, moved]
+
+    def test_micro_batches_by_count(self, tmp_path):
+        paths = [write(tmp_path, f"{n}.csv") for n in range(5)]
+        stop = threading.Event()
+        watcher = FakeWatcher([paths[:2], paths[2:3], paths[3:]], stop)
+
+        batches = micro_batches(watcher, 3, 2**20, 60, stop)
+
+        # the rest is handed over when the watch stops
+        assert list(batches) == [paths[:3], paths[3:]]
+
+    def test_micro_batches_by_latency(self, tmp_path):
+        path = write(tmp_path, "a.csv")
+        stop = threading.Event()
+        watcher = FakeWatcher([[path], [path]], stop)
+
+        batches = micro_batches(watcher, 100, 2**20, 0, stop)
+
+        assert list(batches) == [[path], [path]]
+
+    def test_micro_batches_by_size(self, tmp_path):
+        paths = [write(tmp_path, f"{n}.csv", "x" * 10) for n in range(3)]
+        stop = threading.Event()
+        watcher = FakeWatcher([paths], stop)
+
+        batches = micro_batches(watcher, 100, 10, 60, stop)
+
+        assert next(batches) == paths
+        assert not stop.is_set()